@@ -0,0 +1,26 @@
+## Solve Every Sudoku Puzzle: the solvers, and the tools around them
+
+## See http://norvig.com/sudoku.html
+
+## Importing the package imports none of the modules below, and importing one
+## of them only builds its tables: nothing is solved until it is asked for,
+## from code or from the command line (python -m sudoku --help, see cli.py).
+## Each module's own unit tests run with python -m sudoku.<module>, from the
+## directory that holds the puzzle files (top95.txt, ...).
+
+##   norvig                the reference solver: constraint propagation and search
+##   norvigBitmask         the same, with 9-bit masks for the candidates
+##   norvigHeuristique     norvig.py with naked pairs
+##   norvigSansContrainte  search on the first unfilled square
+##   norvigHillClimbing    local search over filled boxes
+##   localsearch           the same, with swaps scored from row and column counts
+##   rules                 inference rules beyond singles, cheapest first
+##   trail, dlx            search with an undo trail; exact cover with dancing links
+##   boards                any n²×n² board (16x16, 25x25, ...), with masks sized to it
+##   vectorized            propagation over a whole batch at once, with NumPy
+##   topology              the squares, units and peers the solvers share
+##   batch, stream         solving on a pool of processes; streaming corpora and totals
+##   bench, regress        the benchmark suite; the check against its saved baseline
+##   packed, cache         the 41-byte corpus format; the canonical-form solution cache
+##   generate              puzzles with one solution, dug out of random full grids
+##   rate                  difficulty from counts: the hardest rule needed, the search tree
@@ -0,0 +1,164 @@
+## Solve a batch of puzzles on a pool of worker processes
+
+## The solvers' solve_all functions time one grid after another on a single
+## core. solve_batch cuts the grids into chunks, hands the chunks to a pool
+## of processes, and gathers every (time, values) pair back in input order,
+## so the caller can report on them exactly as it does for a serial run.
+## A chunk is several grids, so each trip to a worker carries enough work to
+## pay for the pickling; there are a few chunks per worker, so a worker that
+## drew hard puzzles does not hold up the others for long.
+## solve_stream does the same for an iterable of any length: it reads only a
+## few chunks ahead of what it has handed back, so memory stays bounded.
+## A budget bounds the work on one puzzle, so that no grid can stall a
+## batch: a search that takes one calls spend at each node, and once the
+## nodes or seconds are used up the solve returns TIMED_OUT instead of False.
+## spend reads the clock only every CHECK_EVERY nodes, to stay cheap.
+
+## Throughout this program we have:
+##   solve is a function from a grid to its values (or False); it must be
+##         picklable, i.e. a module-level function or a functools.partial
+##   timed is a list of (seconds, values), one per grid, in input order
+##   budget is None (no limit), or a dict: {'nodes', 'deadline', 'check'}
+
+import collections
+import functools
+import itertools
+import multiprocessing
+import os
+import time
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    from . import dlx
+    grids = dlx.from_file("top95.txt")[:20]
+    assert list(chunked(range(10), 4)) == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    timed, wall = solve_batch(dlx.solve, grids, processes=2)
+    assert [values for t, values in timed] == [dlx.solve(grid) for grid in grids]
+    assert all(t > 0 for t, values in timed) and wall > 0
+    streamed = solve_stream(dlx.solve, iter(grids), processes=2, chunksize=3)
+    assert [(grid, values) for grid, t, values in streamed] == \
+           [(grid, values) for grid, (t, values) in zip(grids, timed)]
+    assert new_budget() is None
+    budget = new_budget(max_nodes=3)
+    for _ in range(3):
+        spend(budget)
+    try:
+        spend(budget)
+        assert False, 'budget not enforced'
+    except OutOfBudget:
+        pass
+    budget = new_budget(max_time=0.0)
+    try:
+        for _ in range(CHECK_EVERY):
+            spend(budget)
+        assert False, 'deadline not enforced'
+    except OutOfBudget:
+        pass
+    import pickle
+    assert not TIMED_OUT and pickle.loads(pickle.dumps(TIMED_OUT)) is TIMED_OUT
+    print('All tests pass.')
+
+
+################ Batches ################
+
+def time_solve(solve, grid):
+    "Solve grid, returning (seconds taken, values)."
+    start = time.perf_counter()
+    values = solve(grid)
+    return (time.perf_counter() - start, values)
+
+
+def time_chunk(solve, grids):
+    "Solve each grid of a chunk in a worker, returning its (seconds, values) pairs."
+    return [time_solve(solve, grid) for grid in grids]
+
+
+def chunked(seq, size):
+    "Split an iterable into consecutive lists of at most size items."
+    it = iter(seq)
+    return iter(lambda: list(itertools.islice(it, size)), [])
+
+
+def solve_batch(solve, grids, processes=None, chunksize=None):
+    """Solve grids on a pool of processes (None for one per core).
+    Return (timed, wall), where wall is the seconds the whole batch took."""
+    grids = list(grids)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, -(-len(grids) // (4 * processes)))  ## About 4 chunks per worker
+    start = time.perf_counter()
+    timed = [(t, values) for grid, t, values in solve_stream(solve, grids, processes, chunksize)]
+    return (timed, time.perf_counter() - start)
+
+
+def solve_stream(solve, grids, processes=1, chunksize=64):
+    """Yield (grid, seconds, values) for each of grids, in input order, as the
+    results come in. With processes other than 1 (None for one per core)
+    the grids are solved in chunks on a pool, a few chunks ahead at most."""
+    if processes == 1:
+        for grid in grids:
+            yield (grid,) + time_solve(solve, grid)
+        return
+    if processes is None:
+        processes = os.cpu_count() or 1
+    work = functools.partial(time_chunk, solve)
+    with multiprocessing.Pool(processes) as pool:
+        pending = collections.deque()  ## (chunk, async result), oldest first
+        for chunk in chunked(grids, chunksize):
+            pending.append((chunk, pool.apply_async(work, (chunk,))))
+            if len(pending) >= 2 * processes:
+                chunk, result = pending.popleft()
+                for grid, pair in zip(chunk, result.get()):
+                    yield (grid,) + pair
+        while pending:
+            chunk, result = pending.popleft()
+            for grid, pair in zip(chunk, result.get()):
+                yield (grid,) + pair
+
+
+################ Budgets ################
+
+CHECK_EVERY = 64
+
+
+class OutOfBudget(Exception):
+    "Raised by spend in a search that has used up its budget."
+
+
+class TimedOut(object):
+    "The result of a solve that ran out of budget: false, like a failure, but no proof of one."
+    def __bool__(self): return False
+    def __repr__(self): return 'TIMED_OUT'
+    def __reduce__(self): return 'TIMED_OUT'  ## Unpickles as the same object, in any process
+
+
+TIMED_OUT = TimedOut()
+
+
+def new_budget(max_nodes=None, max_time=None):
+    "A budget of max_nodes search nodes and max_time seconds from now, or None if neither is given."
+    if max_nodes is None and max_time is None:
+        return None
+    return {'nodes': max_nodes if max_nodes is not None else float('inf'),
+            'deadline': time.perf_counter() + max_time if max_time is not None else float('inf'),
+            'check': CHECK_EVERY}
+
+
+def spend(budget):
+    "Count one search node against budget. Raise OutOfBudget when it is used up."
+    budget['nodes'] -= 1
+    if budget['nodes'] < 0:
+        raise OutOfBudget()
+    budget['check'] -= 1
+    if not budget['check']:
+        budget['check'] = CHECK_EVERY
+        if time.perf_counter() > budget['deadline']:
+            raise OutOfBudget()
+
+
+if __name__ == '__main__':
+    test()
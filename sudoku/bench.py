@@ -0,0 +1,191 @@
+## Benchmark the solvers on the puzzle files, and save the results as JSON
+
+## Every run times the same solvers on the same corpora the same way: a few
+## warmup solves that are not counted, then a number of trials over every
+## puzzle, with the random module reseeded before each trial so that the
+## randomized solvers make the same choices from run to run. For each solver
+## and corpus it reports the solve rate, the throughput, and the latency
+## percentiles over every puzzle of every trial, and it writes them all, with
+## the machine and the commit they were measured on, to a JSON file that
+## can be diffed against the next run's, or checked against (see regress.py).
+## Before each trial it also times a fixed calibration workload, plain Python
+## that uses none of the solvers' code, so that a trial's seconds can be read
+## relative to how fast the machine was running at that moment.
+
+## Throughout this program we have:
+##   name is a solver's name, a subcommand of cli.py, e.g. 'norvig'
+##   times is a sorted list of seconds, one per puzzle solved (or not)
+##   result is a dict of measurements for one solver on one corpus
+##   report is a dict: {'meta': {...}, 'results': [result, ...]}
+## A result keeps, beside its totals, each trial's seconds, p95 and
+## calibration seconds: the samples that regress.py tests a new run against a
+## baseline with.
+
+import importlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from . import cli
+from . import stream
+
+SOLVERS = ['norvig', 'heuristique', 'sanscontrainte', 'hillclimbing']
+CORPORA = ['top95.txt', '100sudoku.txt', '1000sudoku.txt']
+PERCENTILES = [50, 95, 99]
+CALIBRATION_ROUNDS = 2000  ## About 35 ms on the machine the baseline was recorded on
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    assert percentile([1, 2, 3, 4], 50) == 2 and percentile([1, 2, 3, 4], 99) == 4
+    assert percentile([5], 95) == 5
+    report = run(['norvig', 'dlx'], ['top95.txt'], trials=2, warmup=2, limit=10)
+    assert [(r['solver'], r['corpus'], r['N']) for r in report['results']] == \
+           [('norvig', 'top95.txt', 10), ('dlx', 'top95.txt', 10)]
+    r = report['results'][0]
+    assert r['solve_rate'] == 1.0 and r['p50'] <= r['p95'] <= r['p99'] <= r['max']
+    assert len(r['trial_seconds']) == len(r['trial_p95']) == len(r['trial_calibration']) == 2
+    assert r['throughput'] > 0 and min(r['trial_calibration']) > 0
+    assert workload(10) == workload(10) == 7200
+    assert json.loads(json.dumps(report)) == report
+    print('All tests pass.')
+
+
+################ Measuring ################
+
+def percentile(times, p):
+    "The p-th percentile of sorted times, by the nearest-rank method."
+    k = max(0, -(-len(times) * p // 100) - 1)
+    return times[k]
+
+
+def workload(rounds=CALIBRATION_ROUNDS):
+    """A fixed amount of the dict and string work the solvers do, without any
+    of their code: a change to a solver cannot make it faster or slower."""
+    digits = '123456789'
+    total = 0
+    for i in range(rounds):
+        values = dict.fromkeys(range(81), digits)
+        for s in range(0, 81, 9):
+            values[s] = values[s].replace(digits[i % 9], '')
+        total += sum(len(v) for v in values.values())
+    return total
+
+
+def calibrate(repeats=3):
+    "The median seconds that workload takes, over repeats runs: how fast the machine is right now."
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        workload()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[repeats // 2]
+
+
+def solver(name):
+    "The solve function that the CLI subcommand name runs, and its module."
+    module_name, function, help = cli.SOLVERS[name]
+    module = importlib.import_module('.' + module_name, __package__)
+    return getattr(module, function), module
+
+
+def measure(name, filename, trials=3, warmup=10, limit=None, seed=0):
+    "Time solver name on the puzzles of filename. Return its result."
+    solve, module = solver(name)
+    grids = list(stream.read_grids(filename))[:limit]
+    random.seed(seed)
+    for grid in grids[:warmup]:
+        solve(grid)
+    times, trial_seconds, trial_p95, trial_calibration, solved = [], [], [], [], 0
+    for trial in range(trials):
+        trial_calibration.append(calibrate())
+        random.seed(seed + trial)
+        trial_times = []
+        start = time.perf_counter()
+        for grid in grids:
+            t0 = time.perf_counter()
+            values = solve(grid)
+            trial_times.append(time.perf_counter() - t0)
+            solved += bool(values and module.solved(values))  ## Some solvers return None
+        trial_seconds.append(time.perf_counter() - start)
+        trial_p95.append(percentile(sorted(trial_times), 95))
+        times.extend(trial_times)
+    times.sort()
+    N = len(grids)
+    result = {'solver': name, 'corpus': os.path.basename(filename), 'N': N, 'trials': trials,
+              'solve_rate': solved / (N * trials),
+              'throughput': N * trials / sum(trial_seconds),
+              'mean': sum(times) / len(times), 'max': times[-1],
+              'trial_seconds': trial_seconds, 'trial_p95': trial_p95,
+              'trial_calibration': trial_calibration}
+    for p in PERCENTILES:
+        result['p%d' % p] = percentile(times, p)
+    return result
+
+
+def metadata(**settings):
+    "Where and when a run happens: the machine, Python, the commit, and its settings."
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                                text=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except OSError:
+        commit = ''
+    meta = {'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': commit,
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'machine': platform.machine(), 'cpus': os.cpu_count()}
+    meta.update(settings)
+    return meta
+
+
+def run(names=SOLVERS, corpora=CORPORA, trials=3, warmup=10, limit=None, seed=0, verbose=False):
+    "Measure every solver in names on every corpus. Return the report."
+    results = []
+    for filename in corpora:
+        for name in names:
+            result = measure(name, filename, trials, warmup, limit, seed)
+            results.append(result)
+            if verbose:
+                print(line(result))
+                sys.stdout.flush()
+    return {'meta': metadata(trials=trials, warmup=warmup, limit=limit, seed=seed),
+            'results': results}
+
+
+################ Reporting ################
+
+def line(result):
+    "One line of a table of results."
+    return ('%-15s %-15s %5d %6.1f%% %8.1f Hz' % (result['solver'], result['corpus'], result['N'],
+                                                   100 * result['solve_rate'], result['throughput']) +
+            ''.join(' %9.2f ms' % (1000 * result['p%d' % p]) for p in PERCENTILES))
+
+
+def header():
+    "The header of a table of results."
+    return ('%-15s %-15s %5s %7s %11s' % ('solver', 'corpus', 'N', 'solved', 'throughput') +
+            ''.join(' %12s' % ('p%d' % p) for p in PERCENTILES))
+
+
+def save(report, filename):
+    "Write report to filename as JSON, keys sorted so that two runs diff line by line."
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load(filename):
+    "Read a report saved by save."
+    with open(filename) as f:
+        return json.load(f)
+
+
+if __name__ == '__main__':
+    test()
+    print(header())
+    save(run(verbose=True), 'bench.json')
@@ -0,0 +1,248 @@
+## Remember solutions, and reuse them for puzzles that are the same up to symmetry
+
+## Many puzzles in a dump are copies of one another after a relabeling of the
+## digits, a swap of bands (groups of three rows) or stacks (groups of three
+## columns), or a transposition. canonical() brings a grid to one chosen
+## representative of all those variants: of the 72 layouts the swaps and the
+## transposition give, with the digits of each renumbered '1', '2', ... in the
+## order they first appear, it takes the smallest string. Isomorphic puzzles
+## share that string, so a solution found for one of them is kept under it,
+## written in the canonical layout and numbering, and the lookup for another
+## variant maps it back to that variant's own layout and digits.
+## Swaps of rows within a band, or of columns within a stack, are also
+## symmetries, but trying them all would multiply the 72 layouts by 46656;
+## puzzles that differ by those are cached separately.
+
+## The cache is a dict: an LRU of at most maxsize canonical strings in memory,
+## optionally backed by a dbm file that keeps every solution across runs,
+## and the counts of lookups found in memory, found on disk, and missed.
+
+## Throughout this program we have:
+##   grid is a grid as in norvig.py, e.g. 81 non-blank chars starting with '4.....8.5'
+##   key is a canonical grid: 81 chars, '0' for empties
+##   p is a layout: p[i] is the square of grid that goes to square i of key
+##   labels maps each digit of grid (and '0') to its char in key
+##   solution is a solved key, or '' for a puzzle that has no solution
+
+import collections
+import dbm
+import itertools
+
+from .topology import digits, unitlist
+
+from . import dlx
+
+
+def layouts():
+    "The 72 layouts: every transposition, order of bands and order of stacks."
+    result = []
+    for transpose in (False, True):
+        for bands in itertools.permutations(range(3)):
+            for stacks in itertools.permutations(range(3)):
+                p = []
+                for i in range(81):
+                    r, c = divmod(i, 9)
+                    r, c = 3 * bands[r // 3] + r % 3, 3 * stacks[c // 3] + c % 3
+                    p.append(c * 9 + r if transpose else r * 9 + c)
+                result.append(tuple(p))
+    return result
+
+
+LAYOUTS = layouts()
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    assert len(set(LAYOUTS)) == 72 and all(sorted(p) == list(range(81)) for p in LAYOUTS)
+    ## A variant of grid2: transposed, bands and stacks reordered, digits relabeled.
+    relabel = dict(zip('0123456789', '0918273645'))
+    variant = ''.join(relabel[grid2.replace('.', '0')[i]] for i in LAYOUTS[-1])
+    assert canonical(variant)[0] == canonical(grid2)[0]
+    c = new_cache(maxsize=2)
+    assert solved(solve(grid2, c)) and solved(solve(variant, c))
+    assert solve(variant, c) == dlx.solve(variant)
+    assert (c['hits'], c['disk_hits'], c['misses']) == (2, 0, 1)
+    assert solve('11' + '.' * 79, c) is False and solve('11' + '.' * 79, c) is False
+    assert len(c['lru']) == 2 and c['misses'] == 2
+    import os, tempfile
+    filename = os.path.join(tempfile.mkdtemp(), 'solutions')
+    c = new_cache(filename=filename)
+    solve(grid2, c)
+    close(c)
+    c = new_cache(filename=filename)
+    assert solved(solve(variant, c)) and (c['hits'], c['disk_hits'], c['misses']) == (0, 1, 0)
+    close(c)
+    worker_caches.pop(2, None)
+    assert solve_counted(grid2, 2) == (solve(grid2, new_cache()), {'hits': 0, 'disk_hits': 0, 'misses': 1})
+    assert solve_counted(variant, 2)[1] == {'hits': 1, 'disk_hits': 0, 'misses': 0}
+    print('All tests pass.')
+
+
+################ Canonical Form ################
+
+def canonical(grid):
+    "Return (key, p, labels): the smallest renumbered layout of grid, and how it was made."
+    chars = [c if c in digits else '0' for c in dlx.grid_values(grid)]
+    best = None
+    for p in LAYOUTS:
+        labels = {'0': '0'}
+        out = []
+        for s in p:
+            c = chars[s]
+            if c not in labels:
+                labels[c] = digits[len(labels) - 1]
+            out.append(labels[c])
+        key = ''.join(out)
+        if best is None or key < best[0]:
+            best = (key, p, labels)
+    return best
+
+
+def to_key(values, p, labels):
+    "Write the solved values of a grid as a solution in its canonical layout and numbering."
+    labels = dict(labels)
+    for d in values:  ## Digits the puzzle did not give get the labels left over
+        if d not in labels:
+            labels[d] = digits[len(labels) - 1]
+    return ''.join(labels[values[s]] for s in p)
+
+
+def from_key(solution, p, labels):
+    "Map a canonical solution back to the grid's layout: a list of 81 digits, like norvig.py's values."
+    inverse = dict((c, d) for d, c in labels.items() if d != '0')
+    unused = [d for d in digits if d not in labels]
+    for c in digits:  ## Any numbering of the digits the puzzle did not give will do
+        if c not in inverse:
+            inverse[c] = unused.pop(0)
+    values = [None] * 81
+    for i, s in enumerate(p):
+        values[s] = inverse[solution[i]]
+    return values
+
+
+################ Cache ################
+
+def new_cache(maxsize=1024, filename=None):
+    "An empty cache of at most maxsize solutions in memory, backed by the dbm file filename if given."
+    return {'lru': collections.OrderedDict(), 'maxsize': maxsize,
+            'db': dbm.open(filename, 'c') if filename else None,
+            'hits': 0, 'disk_hits': 0, 'misses': 0}
+
+
+def close(cache):
+    "Close the cache's backing file, if it has one."
+    if cache['db'] is not None:
+        cache['db'].close()
+        cache['db'] = None
+
+
+def lookup(cache, key):
+    "The solution stored under key, or None, counting a hit or a miss."
+    lru = cache['lru']
+    if key in lru:
+        lru.move_to_end(key)
+        cache['hits'] += 1
+        return lru[key]
+    if cache['db'] is not None and key in cache['db']:
+        cache['disk_hits'] += 1
+        solution = cache['db'][key].decode('ascii')
+        remember(cache, key, solution, write=False)
+        return solution
+    cache['misses'] += 1
+    return None
+
+
+def remember(cache, key, solution, write=True):
+    "Store solution under key, dropping the least recently used one if the cache is full."
+    lru = cache['lru']
+    lru[key] = solution
+    lru.move_to_end(key)
+    if len(lru) > cache['maxsize']:
+        lru.popitem(last=False)
+    if write and cache['db'] is not None:
+        cache['db'][key] = solution
+
+
+def solve(grid, cache, solver=dlx.solve):
+    """Solve grid through the cache, calling solver (which returns a list of
+    81 digits, or False) only for puzzles not seen before in any variant."""
+    key, p, labels = canonical(grid)
+    solution = lookup(cache, key)
+    if solution is None:
+        values = solver(grid)
+        solution = to_key(values, p, labels) if values else ''
+        remember(cache, key, solution)
+    return solution and from_key(solution, p, labels) or False
+
+
+################ System test ################
+
+import functools
+import time
+
+from . import batch
+from . import stream
+
+COUNTS = ('hits', 'disk_hits', 'misses')
+worker_caches = {}  ## maxsize -> the in-memory cache of this worker process
+
+
+def solve_counted(grid, maxsize=1024):
+    """Solve grid through this process's own in-memory cache of maxsize
+    solutions; return (values, the hits and misses of this lookup)."""
+    if maxsize not in worker_caches:
+        worker_caches[maxsize] = new_cache(maxsize)
+    cache = worker_caches[maxsize]
+    before = [cache[k] for k in COUNTS]
+    values = solve(grid, cache)
+    return values, dict((k, cache[k] - n) for k, n in zip(COUNTS, before))
+
+
+def solve_all(grids, name='', cache=None, processes=1):
+    """Attempt to solve a sequence of grids through a cache. Report results,
+    and the cache's counts. With processes other than 1 (None for one per
+    core), each worker process looks up in a cache of its own, of the same
+    size but in memory only, and the report adds up their counts."""
+    if cache is None:
+        cache = new_cache()
+    if processes == 1:
+        solver = functools.partial(solve, cache=cache)
+    else:
+        solver = functools.partial(solve_counted, maxsize=cache['maxsize'])
+    totals = stream.new_totals()
+    counts = dict((k, cache[k]) for k in COUNTS)
+    start = time.perf_counter()
+    for grid, t, values in batch.solve_stream(solver, grids, processes):
+        if processes != 1:
+            values, lookup_counts = values
+            stream.add_counts(counts, lookup_counts)
+        stream.add(totals, t, solved(values), grid)
+    wall = time.perf_counter() - start if processes != 1 else None
+    if processes == 1:
+        counts = cache  ## Counted in place
+    if totals['N'] > 1:
+        print(stream.summary(totals, name, wall))
+        print(stream.latency(totals))
+        print("  %(hits)d hits, %(disk_hits)d disk hits, %(misses)d misses." % counts)
+
+
+def solved(values):
+    "A puzzle is solved if each unit is a permutation of the digits 1 to 9."
+
+    def unitsolved(unit): return set(values[s] for s in unit) == set(digits)
+
+    return values is not False and all(unitsolved(unit) for unit in unitlist)
+
+
+def from_file(filename, sep='\n'):
+    "Parse a file into a list of strings, separated by sep."
+    return open(filename).read().strip().split(sep)
+
+
+grid2 = '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......'
+
+if __name__ == '__main__':
+    test()
+    solve_all(from_file("top95.txt") * 2, "95sudoku, twice")
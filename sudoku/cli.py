@@ -0,0 +1,305 @@
+## Command line: solve puzzle files with any of the solvers
+
+## python -m sudoku SOLVER CORPUS... runs SOLVER on every puzzle of each
+## corpus, a text file with one puzzle per line (or per --sep), or a packed
+## .bin file (see packed.py), and prints norvig.py's report line for each.
+## The solver module is imported only once its subcommand is chosen, so
+## python -m sudoku --help, or a typo, costs no more than argparse.
+
+## Throughout this program we have:
+##   SOLVERS maps a subcommand to (module, solve function, help)
+
+import argparse
+import functools
+import importlib
+import sys
+import time
+
+from . import batch
+from . import stream
+
+SOLVERS = {'norvig': ('norvig', 'solve', 'constraint propagation and search (norvig.py)'),
+           'bitmask': ('norvigBitmask', 'solve', 'the same with 9-bit candidate masks'),
+           'heuristique': ('norvigHeuristique', 'solve_naked_pairs', 'search with naked pairs'),
+           'sanscontrainte': ('norvigSansContrainte', 'solve', 'search on the first unfilled square'),
+           'hillclimbing': ('norvigHillClimbing', 'solve_hillClimbing', 'hill climbing over filled boxes'),
+           'localsearch': ('localsearch', 'hill_climb', 'hill climbing with incrementally scored swaps'),
+           'anneal': ('localsearch', 'anneal', 'simulated annealing with incrementally scored swaps'),
+           'portfolio': ('localsearch', 'portfolio', 'hill climbing from one seed per core, first to finish wins'),
+           'trail': ('trail', 'solve', 'search with an undo trail instead of copies'),
+           'dlx': ('dlx', 'solve', 'exact cover with dancing links'),
+           'rules': ('rules', 'solve', 'search with the inference rules of rules.py'),
+           'boards': ('boards', 'solve', 'any n²×n² board: 4x4, 9x9, 16x16 or 25x25, sized from each grid')}
+
+## The solvers whose solve takes max_nodes and max_time (see batch.new_budget)
+BUDGETED = ['norvig', 'sanscontrainte']
+
+## anneal's time limit per puzzle: a puzzle it can't solve would otherwise
+## run all of its max_iters iterations, minutes on top95.txt
+ANNEAL_SECONDS = 1.0
+
+MODULES = ['topology', 'norvig', 'norvigBitmask', 'norvigHeuristique', 'norvigSansContrainte',
+           'norvigHillClimbing', 'trail', 'dlx', 'boards', 'batch', 'stream',
+           'packed', 'cache', 'vectorized', 'localsearch', 'rules', 'bench', 'regress', 'generate', 'rate', 'cli']
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    import contextlib, io, json, os, subprocess, tempfile
+    ## Importing the package, or the CLI, solves nothing and loads no solver.
+    loaded = subprocess.run([sys.executable, '-c', 'import sudoku.cli, sys; '
+                             'print(sorted(m for m in sys.modules if m.startswith("sudoku")))'],
+                            capture_output=True, text=True).stdout
+    assert loaded.strip() == "['sudoku', 'sudoku.batch', 'sudoku.cli', 'sudoku.stream']"
+    filename = os.path.join(tempfile.mkdtemp(), 'solutions.txt')
+    assert main(['dlx', 'top95.txt', '--quiet', '--solutions', filename]) == 0
+    lines = open(filename).read().split()
+    assert len(lines) == 95 and all(len(line) == 81 and '.' not in line for line in lines)
+    args = parser().parse_args(['norvig', 'a.txt', 'b.txt', '--engine', 'trail', '-j', '0'])
+    assert (args.solver, args.corpus, args.engine, args.processes) == ('norvig', ['a.txt', 'b.txt'], 'trail', 0)
+    for argv in (['portfolio', 'top95.txt', '-j', '2'],
+                 ['norvig', 'top95.txt', '--engine', 'dlx', '--max-nodes', '5'],
+                 ['norvig', 'top95.txt', '--engine', 'trail', '--counters'],
+                 ['regress', '--trials', '1'],
+                 ['rules', 'top95.txt', '--rules', 'naked_pairs,swordfish']):
+        try:
+            with contextlib.redirect_stderr(io.StringIO()):
+                main(argv)
+            assert False, 'accepted ' + ' '.join(argv)
+        except SystemExit as e:
+            assert e.code == 2
+    corpus = os.path.join(tempfile.mkdtemp(), 'hexadoku.txt')
+    with open(corpus, 'w') as f:
+        f.write('00' + '.' * 254 + '\n')  ## Two 0s in a row: no solution
+    assert main(['boards', corpus, '--quiet', '--solutions', filename]) == 0
+    assert open(filename).read() == '.' * 256 + '\n' and size('1 2 | 3 4 .') == 5
+    assert main(['norvig', 'top95.txt', '--counters', '--quiet', '--solutions', filename]) == 0
+    assert open(filename).read().split() == lines
+    assert main(['norvig', 'top95.txt', '-q', '--max-nodes', '50', '--latency-json', filename]) == 0
+    report, = json.load(open(filename))
+    assert report['timed_out'] > 0 and report['solved'] + report['timed_out'] == 95
+    assert main(['bitmask', 'top95.txt', '-q', '--slowest', '2', '--latency-json', filename]) == 0
+    report, = json.load(open(filename))
+    assert report['N'] == 95 and len(report['slowest']) == 2 and report['percentiles']['p99'] <= report['max']
+    assert parser().parse_args(['anneal', 'a.txt']).max_time == ANNEAL_SECONDS
+    assert main(['anneal', 'top95.txt', '-q', '--max-iters', '100', '--latency-json', filename]) == 0
+    report, = json.load(open(filename))
+    assert report['N'] == 95 and report['solved'] < 95
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        assert main(['rules', 'top95.txt', '--rules', 'x_wing,naked_pairs', '--solutions', filename]) == 0
+    assert [line.split()[0] for line in out.getvalue().splitlines()[-4:]] == ['rule', 'singles', 'naked_pairs', 'x_wing']
+    assert open(filename).read().split() == lines
+    print('All tests pass.')
+
+
+################ Arguments ################
+
+def parser():
+    "The argument parser: one subcommand per solver, and one to run the unit tests."
+    p = argparse.ArgumentParser(prog='python -m sudoku', description='Solve every Sudoku puzzle.')
+    sub = p.add_subparsers(dest='solver', metavar='SOLVER', required=True)
+    for name, (module, function, help) in SOLVERS.items():
+        s = sub.add_parser(name, help=help, description='Solve puzzle files: ' + help + '.')
+        s.add_argument('corpus', nargs='+', help='puzzle file: text, or packed .bin')
+        s.add_argument('--sep', default='\n', help='separator between puzzles in a text file')
+        s.add_argument('-j', '--processes', type=int, default=1,
+                       help='worker processes (0 for one per core; default 1)')
+        s.add_argument('--show', type=float, metavar='SECS',
+                       help='display puzzles that take longer than SECS seconds')
+        s.add_argument('--solutions', metavar='FILE',
+                       help="write each solution to FILE, one per line (all '.' if unsolved)")
+        s.add_argument('--slowest', type=int, default=0, metavar='K',
+                       help='list the K slowest puzzles after the report (default none)')
+        s.add_argument('--latency-json', metavar='FILE',
+                       help='save each corpus\'s latency report (percentiles, histogram, slowest) as JSON')
+        s.add_argument('-q', '--quiet', action='store_true', help='no report lines')
+        if name in BUDGETED:
+            s.add_argument('--max-nodes', type=int, metavar='N',
+                           help='give up on a puzzle after N search nodes (reported as timed out)')
+            s.add_argument('--max-time', type=float, metavar='SECS',
+                           help='give up on a puzzle after SECS seconds (reported as timed out)')
+        if name == 'norvig':
+            s.add_argument('--engine', default='norvig', choices=['norvig', 'trail', 'dlx', 'cached'],
+                           help='search engine for norvig.solve (default norvig)')
+            s.add_argument('--counters', action='store_true',
+                           help="count nodes, backtracks and contradictions (norvig's search only)")
+        if name == 'anneal':
+            s.add_argument('--max-iters', type=int, default=2000000, metavar='N',
+                           help='give up on a puzzle after N iterations (default 2000000)')
+            s.add_argument('--max-time', type=float, default=ANNEAL_SECONDS, metavar='SECS',
+                           help='give up on a puzzle after SECS seconds (default %g)' % ANNEAL_SECONDS)
+        if name == 'rules':
+            s.add_argument('--rules', type=lambda names: [n for n in names.split(',') if n], metavar='NAMES',
+                           help="comma-separated rules to apply after singles, e.g. naked_pairs,x_wing; "
+                                "'' for singles only (default: every rule of rules.RULES)")
+    sub.add_parser('test', help="run every module's unit tests (from the puzzle files' directory)")
+    b = sub.add_parser('bench', help='benchmark solvers on corpora and save the results as JSON',
+                       description='Benchmark solvers on corpora (see bench.py).')
+    b.add_argument('corpus', nargs='*', help='puzzle files (default: top95, 100sudoku and 1000sudoku)')
+    b.add_argument('-s', '--solvers', nargs='+', choices=list(SOLVERS), metavar='SOLVER',
+                   help='solvers to run (default: norvig heuristique sanscontrainte hillclimbing)')
+    b.add_argument('--trials', type=int, default=3, help='timed passes over each corpus (default 3)')
+    b.add_argument('--warmup', type=int, default=10, help='untimed solves first (default 10)')
+    b.add_argument('--limit', type=int, help='only the first LIMIT puzzles of each corpus')
+    b.add_argument('--seed', type=int, default=0, help='seed for the random module (default 0)')
+    b.add_argument('--json', metavar='FILE', default='bench.json', help='where to save the results')
+    r = sub.add_parser('regress', help='rerun the baseline benchmark and fail if it got slower',
+                       description='Compare a fresh benchmark with a saved baseline (see regress.py).')
+    r.add_argument('--baseline', help='the saved baseline report (default: benchmarks/baseline.json in the repository)')
+    r.add_argument('--threshold', type=float, default=0.20,
+                   help='slowdown of the median that counts as a regression (default 0.20)')
+    r.add_argument('--alpha', type=float, default=0.05, help='significance level (default 0.05)')
+    r.add_argument('--trials', type=int, help="timed passes, at least 2 (default: the baseline's)")
+    r.add_argument('--update', action='store_true',
+                   help='save the fresh run as the new baseline (after changing machines, or on purpose)')
+    g = sub.add_parser('generate', help='generate puzzles with one solution into a corpus',
+                       description='Generate unique puzzles by digging clues out of random grids (see generate.py).')
+    g.add_argument('n', type=int, help='number of puzzles')
+    g.add_argument('corpus', help='file to write: text, one puzzle per line, or packed .bin')
+    g.add_argument('--clues', type=int, metavar='K', help='at most K clues per puzzle (default: dig to minimal)')
+    g.add_argument('--symmetry', default='none', choices=['none', 'rotational', 'mirror', 'diagonal'],
+                   help='keep the clues symmetric (default none)')
+    g.add_argument('-j', '--processes', type=int, default=1,
+                   help='worker processes (0 for one per core; default 1)')
+    g.add_argument('--seed', type=int, default=0, help='seed of the first puzzle (default 0)')
+    t = sub.add_parser('rate', help='rate puzzles by the hardest rule they need and their search tree',
+                       description='Rate puzzles from counts, not timings (see rate.py).')
+    t.add_argument('corpus', nargs='+', help='puzzle file: text, or packed .bin')
+    t.add_argument('--sep', default='\n', help='separator between puzzles in a text file')
+    t.add_argument('-j', '--processes', type=int, default=1,
+                   help='worker processes (0 for one per core; default 1)')
+    return p
+
+
+################ Running ################
+
+def main(argv=None):
+    "Run the command line argv (sys.argv[1:] if None). Return the exit status."
+    p = parser()
+    args = p.parse_args(argv)
+    if args.solver == 'portfolio' and args.processes != 1:
+        p.error('portfolio runs its own worker processes, one per core: leave -j at 1')
+    if args.solver == 'norvig' and args.engine != 'norvig' and (args.max_nodes is not None or
+                                                                args.max_time is not None):
+        p.error('--max-nodes and --max-time need --engine norvig')
+    if args.solver == 'norvig' and args.counters and args.engine != 'norvig':
+        p.error("--counters counts norvig's own search: it needs --engine norvig")
+    if args.solver == 'test':
+        for name in MODULES:
+            importlib.import_module('.' + name, __package__).test()
+        return 0
+    if args.solver == 'bench':
+        from . import bench
+        print(bench.header())
+        report = bench.run(args.solvers or bench.SOLVERS, args.corpus or bench.CORPORA,
+                           args.trials, args.warmup, args.limit, args.seed, verbose=True)
+        bench.save(report, args.json)
+        return 0
+    if args.solver == 'regress':
+        if args.trials is not None and args.trials < 2:
+            p.error('--trials must be at least 2: with 1, no slowdown is significant')
+        from . import bench, regress
+        baseline = args.baseline or regress.BASELINE
+        passed, report = regress.check(baseline, args.threshold, args.alpha, trials=args.trials)
+        if args.update:
+            bench.save(report, baseline)
+        return 0 if passed or args.update else 1
+    if args.solver == 'rate':
+        from . import rate
+        for filename in args.corpus:
+            rate.rate_file(read_corpus(filename, args.sep), filename, args.processes or None)
+        return 0
+    if args.solver == 'generate':
+        if args.n < 0:
+            p.error('the number of puzzles cannot be negative')
+        from . import generate
+        generate.generate_file(args.corpus, args.n, args.clues, args.symmetry, args.processes or None, args.seed)
+        return 0
+    module_name, function, help = SOLVERS[args.solver]
+    module = importlib.import_module('.' + module_name, __package__)
+    solve = getattr(module, function)
+    if args.solver == 'norvig':
+        solve = module.solve_counted if args.counters else functools.partial(solve, engine=args.engine)
+    if args.solver == 'anneal':
+        solve = functools.partial(solve, max_iters=args.max_iters, max_time=args.max_time)
+    if args.solver == 'rules':
+        if args.rules is None:
+            args.rules = list(module.RULES)
+        unknown = [name for name in args.rules if name not in module.RULES]
+        if unknown:
+            p.error('unknown rule %s (choose from %s)' % (', '.join(unknown), ', '.join(module.RULES)))
+        solve = functools.partial(module.solve_counted, names=args.rules)
+    if args.solver in BUDGETED and (args.max_nodes is not None or args.max_time is not None):
+        solve = functools.partial(solve, max_nodes=args.max_nodes, max_time=args.max_time)
+    out = open(args.solutions, 'w') if args.solutions else None
+    try:
+        reports = [run(module, solve, filename, args, out) for filename in args.corpus]
+    finally:
+        if out:
+            out.close()
+    if args.latency_json:
+        stream.save(reports, args.latency_json)
+    return 0
+
+
+def run(module, solve, filename, args, out):
+    """Solve every puzzle of one corpus, as norvig.solve_all does, with the
+    options in args. Return its latency report (see stream.report)."""
+    grids = read_corpus(filename, args.sep)
+    processes = args.processes or None
+    totals = stream.new_totals(args.slowest)
+    counts = {}
+    counted = getattr(args, 'counters', False)
+    rules = getattr(args, 'rules', None)  ## The rules subcommand's names: it counts each rule
+    rule_stats = module.new_stats(rules) if rules is not None else None
+    start = time.perf_counter()
+    for grid, t, values in batch.solve_stream(solve, grids, processes):
+        if counted:
+            values, puzzle_counts = values
+            stream.add_counts(counts, puzzle_counts)
+        elif rule_stats is not None:
+            values, puzzle_stats = values
+            module.add_stats(rule_stats, puzzle_stats)
+        ok = bool(values) and module.solved(values)  ## Some solvers return None
+        if args.show is not None and t > args.show:
+            print('%s (%.2f seconds)' % (grid, t))
+            if counted:
+                print('  ' + stream.counts_line(puzzle_counts))
+        if out:
+            out.write(as_line(module, values) if ok else '.' * size(grid))
+            out.write('\n')
+        stream.add(totals, t, ok, grid, values is batch.TIMED_OUT)
+    wall = time.perf_counter() - start if processes != 1 else None
+    if not args.quiet and totals['N']:
+        print(stream.summary(totals, filename, wall))
+        print(stream.latency(totals))
+        if counted:
+            print('  ' + stream.counts_line(counts))
+        if rule_stats is not None:
+            print(module.table(rule_stats, rules))
+    return stream.report(totals, filename, wall)
+
+
+def read_corpus(filename, sep='\n'):
+    "The puzzles of a corpus file, one at a time: packed if it ends in .bin, else text."
+    if filename.endswith('.bin'):
+        from . import packed
+        return packed.read_grids(filename)
+    return stream.read_grids(filename, sep)
+
+
+def size(grid):
+    "The number of squares of grid: its symbols and empties, without spaces or '|' and the like."
+    return sum(c.isalnum() or c == '.' for c in grid)
+
+
+def as_line(module, values):
+    "The 81 digits of solved values, whichever form the module keeps them in."
+    bit_digit = getattr(module, 'bit_digit', None)  ## norvigBitmask's masks
+    return ''.join(bit_digit[v] for v in values) if bit_digit else ''.join(values)
+
+
+if __name__ == '__main__':
+    test()
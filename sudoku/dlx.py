@@ -0,0 +1,239 @@
+## Solve Every Sudoku Puzzle as an exact cover problem
+
+## See https://arxiv.org/abs/cs/0011047 (Knuth, "Dancing Links")
+
+## A filled grid picks, for each of the 81 squares, one digit; that choice is
+## a row of a 729 x 324 0/1 matrix. Its 4 ones are the constraints it meets:
+## square s has a digit, row r has digit d, column c has d, and box b has d.
+## A solution is a set of rows that covers every column exactly once.
+## Algorithm X finds them, always branching on the column with the fewest
+## rows left, and the matrix is kept as circular doubly linked lists so that
+## covering a column and uncovering it again are a handful of list writes.
+
+## Throughout this program we have:
+##   s is a square, e.g. 2 for 'A3' (see topology.py)
+##   k is a digit index, 0..8 for '1'..'9'
+##   row is a matrix row, s * 9 + k: digit k + 1 in square s
+##   c is a matrix column, 1..324 (0 is the root of the column list)
+##   i, j are nodes: the column headers, then 4 nodes per matrix row
+##   L, R, U, D are the left/right/up/down links of each node, C its column,
+##   and S the number of rows still in each column
+
+from .topology import digits, unitlist
+
+NCOLS = 4 * 81
+
+
+def constraints(row):
+    "The 4 columns that row covers: its square, and its digit in its row, column and box."
+    s, k = divmod(row, 9)
+    r, c = divmod(s, 9)
+    b = r // 3 * 3 + c // 3
+    return (1 + s, 1 + 81 + r * 9 + k, 1 + 162 + c * 9 + k, 1 + 243 + b * 9 + k)
+
+
+def build_links():
+    """Build the links of the full, empty-grid matrix. Return L, R, U, D, C, S
+    and the first node of each matrix row."""
+    L = [c - 1 for c in range(NCOLS + 1)]
+    R = [c + 1 for c in range(NCOLS + 1)]
+    L[0], R[NCOLS] = NCOLS, 0
+    U = list(range(NCOLS + 1))
+    D = list(range(NCOLS + 1))
+    C = list(range(NCOLS + 1))
+    S = [0] * (NCOLS + 1)
+    row_node = []
+    for row in range(729):
+        first = len(C)
+        row_node.append(first)
+        for n, c in enumerate(constraints(row)):
+            i = first + n
+            L.append(first + (n - 1) % 4)
+            R.append(first + (n + 1) % 4)
+            U.append(U[c])
+            D.append(c)
+            C.append(c)
+            D[U[c]] = i
+            U[c] = i
+            S[c] += 1
+    return L, R, U, D, C, S, row_node
+
+
+## Built once; every puzzle works on its own copy of the links.
+L0, R0, U0, D0, C0, S0, row_node = build_links()
+node_row = [0] * (NCOLS + 1) + [row for row in range(729) for _ in range(4)]
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    assert len(C0) == NCOLS + 1 + 729 * 4
+    assert all(S0[c] == 9 for c in range(1, NCOLS + 1))
+    assert all(len(set(constraints(row))) == 4 for row in range(729))
+    assert solved(solve(grid1)) and solved(solve(grid2)) and solved(solve(hard1))
+    assert count_solutions(grid1) == 1
+    assert count_solutions('.' * 81, limit=5) == 5
+    assert count_solutions('11' + '.' * 79) == 0 and solve('11' + '.' * 79) is False
+    print('All tests pass.')
+
+
+################ Parse a Grid ################
+
+def grid_values(grid):
+    "Convert grid into a list of 81 chars with '0' or '.' for empties."
+    chars = [c for c in grid if c in digits or c in '0.']
+    assert len(chars) == 81
+    return chars
+
+
+################ Search ################
+
+def solutions(grid):
+    """Generate every solution of grid, each as a list of 81 digits,
+    in the format of norvig.py's solved values."""
+    L, R, U, D, S = L0[:], R0[:], U0[:], D0[:], S0[:]
+    C = C0
+
+    def cover(c):
+        "Take column c out of the header list, and its rows out of every other column."
+        L[R[c]] = L[c]
+        R[L[c]] = R[c]
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                U[D[j]] = U[j]
+                D[U[j]] = D[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def uncover(c):
+        "Undo cover(c), relinking in the exact reverse order."
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                U[D[j]] = j
+                D[U[j]] = j
+                j = L[j]
+            i = U[i]
+        L[R[c]] = c
+        R[L[c]] = c
+
+    ## The given digits are rows that must be in the solution: cover them up front.
+    chosen = []
+    covered = [False] * (NCOLS + 1)
+    for s, d in enumerate(grid_values(grid)):
+        if d in digits:
+            row = s * 9 + digits.index(d)
+            cols = constraints(row)
+            if any(covered[c] for c in cols):
+                return  ## Contradiction: a given clashes with another
+            for c in cols:
+                covered[c] = True
+                cover(c)
+            chosen.append(row)
+
+    def search():
+        c = R[0]
+        if c == 0:
+            yield chosen  ## Every column covered
+            return
+        ## Branch on the column with the fewest rows left.
+        n = S[c]
+        j = R[c]
+        while j and n > 1:
+            if S[j] < n:
+                c, n = j, S[j]
+            j = R[j]
+        if n == 0:
+            return  ## Contradiction: a constraint nothing can meet
+        cover(c)
+        i = D[c]
+        while i != c:
+            chosen.append(node_row[i])
+            j = R[i]
+            while j != i:
+                cover(C[j])
+                j = R[j]
+            yield from search()
+            j = L[i]
+            while j != i:
+                uncover(C[j])
+                j = L[j]
+            chosen.pop()
+            i = D[i]
+        uncover(c)
+
+    for rows in search():
+        values = [None] * 81
+        for row in rows:
+            s, k = divmod(row, 9)
+            values[s] = digits[k]
+        yield values
+
+
+def solve(grid):
+    "The first solution of grid, or False if it has none."
+    return next(solutions(grid), False)
+
+
+def count_solutions(grid, limit=None):
+    "Count the solutions of grid, stopping as soon as limit (if any) is reached."
+    n = 0
+    for _ in solutions(grid):
+        n += 1
+        if n == limit:
+            break
+    return n
+
+
+################ System test ################
+
+import time
+
+from . import batch
+from . import stream
+
+
+def solve_all(grids, name='', showif=None, processes=1):
+    """Attempt to solve a sequence of grids, on processes worker processes
+    (None for one per core). Report results.
+    When showif is a number of seconds, print puzzles that take longer."""
+    totals = stream.new_totals()
+    start = time.perf_counter()
+    for grid, t, values in batch.solve_stream(solve, grids, processes):
+        if showif is not None and t > showif:
+            print('%s (%.2f seconds)' % (grid, t))
+        stream.add(totals, t, solved(values), grid)
+    wall = time.perf_counter() - start if processes != 1 else None
+    if totals['N'] > 1:
+        print(stream.summary(totals, name, wall))
+        print(stream.latency(totals))
+
+
+def solved(values):
+    "A puzzle is solved if each unit is a permutation of the digits 1 to 9."
+
+    def unitsolved(unit): return set(values[s] for s in unit) == set(digits)
+
+    return values is not False and all(unitsolved(unit) for unit in unitlist)
+
+
+def from_file(filename, sep='\n'):
+    "Parse a file into a list of strings, separated by sep."
+    return open(filename).read().strip().split(sep)
+
+
+grid1 = '003020600900305001001806400008102900700000008006708200002609500800203009005010300'
+grid2 = '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......'
+hard1 = '.....6....59.....82....8....45........3........6..3.54...325..6..................'
+
+if __name__ == '__main__':
+    test()
+    solve_all(from_file("top95.txt"), "95sudoku")
+    solve_all(from_file("100sudoku.txt"), "hard")
+    solve_all(from_file("1000sudoku.txt"), "hard")
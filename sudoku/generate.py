@@ -0,0 +1,196 @@
+## Generate puzzles with exactly one solution, in bulk
+
+## norvig.random_puzzle assigns random digits until enough squares are
+## filled: the result may have no solution, or many. Here every puzzle
+## starts from a random full grid (its three diagonal boxes shuffled, which
+## cannot clash, and the rest filled in by dlx.py) and its clues are taken
+## away in random order, each only if the puzzle still has exactly one
+## solution, which dlx.count_solutions with limit 2 checks in about the time
+## of one solve. With a symmetry, clues go an orbit at a time (a square and
+## its images), so the clues that are left keep the symmetry. Digging stops
+## at the target number of clues, or when no clue can go (the puzzle is
+## minimal); a puzzle that stops above the target is dropped and the worker
+## starts again from a new grid.
+## Each puzzle comes from its own seed, so a run gives the same puzzles on
+## one process or many: generate hands the seeds to a pool of processes
+## (batch.solve_stream) and yields the puzzles in order as they come in, and
+## write streams them to a corpus, text or packed. The number that matters
+## is unique puzzles per second.
+
+## Throughout this program we have:
+##   solution is a list of 81 digits, a full grid
+##   puzzle is a grid: a string of 81 chars, with '.' for empties
+##   symmetry is a name in SYMMETRIES, e.g. 'rotational'
+##   orbit is a tuple of squares that a symmetry maps onto each other
+##   target is the most clues a puzzle may keep, or None to dig as far as it goes
+##   seed is an int; a puzzle is made with random.Random(seed)
+
+import functools
+import itertools
+import os
+import random
+import time
+
+from .topology import digits, box_units
+from . import batch
+from . import dlx
+
+SYMMETRIES = {'none': lambda s: s,
+              'rotational': lambda s: 80 - s,                 ## Half turn about the center
+              'mirror': lambda s: s // 9 * 9 + 8 - s % 9,     ## Left to right
+              'diagonal': lambda s: s % 9 * 9 + s // 9}       ## About the main diagonal
+
+
+def orbits(symmetry):
+    "The squares, grouped into the orbits of symmetry (each symmetry is its own inverse)."
+    image = SYMMETRIES[symmetry]
+    return sorted(set(tuple(sorted(set([s, image(s)]))) for s in range(81)))
+
+
+ORBITS = dict((name, orbits(name)) for name in SYMMETRIES)
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    for name in SYMMETRIES:
+        assert sorted(s for orbit in ORBITS[name] for s in orbit) == list(range(81))
+    assert len(ORBITS['none']) == 81 and len(ORBITS['rotational']) == 41
+    assert dlx.solved(random_solution(random.Random(1)))
+    assert random_solution(random.Random(1)) != random_solution(random.Random(2))
+    puzzle = make_puzzle(7)
+    assert puzzle == make_puzzle(7) and dlx.count_solutions(puzzle, 2) == 1
+    assert all(dlx.count_solutions(puzzle[:s] + '.' + puzzle[s + 1:], 2) == 2
+               for s in range(81) if puzzle[s] != '.')  ## Minimal: no clue can go
+    puzzle = make_puzzle(7, target=30, symmetry='rotational')
+    assert clues(puzzle) <= 30 and dlx.count_solutions(puzzle, 2) == 1
+    assert all((puzzle[s] == '.') == (puzzle[80 - s] == '.') for s in range(81))
+    assert list(generate(0)) == []
+    puzzles = list(generate(6, target=32, processes=2, seed=3))
+    assert puzzles == list(generate(6, target=32, seed=3)) and len(set(puzzles)) == 6
+    import contextlib, io, tempfile
+    from . import packed, stream
+    directory = tempfile.mkdtemp()
+    for filename, read in [('puzzles.txt', stream.read_grids), ('puzzles.bin', packed.read_grids)]:
+        filename = os.path.join(directory, filename)
+        assert write(puzzles, filename) == 6
+        assert [grid.replace('0', '.') for grid in read(filename)] == puzzles
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert generate_file(os.path.join(directory, 'none.txt'), 0) == 0.0
+    print('All tests pass.')
+
+
+################ Making a puzzle ################
+
+def random_solution(rng):
+    "A random full grid: the three diagonal boxes shuffled, the rest solved for."
+    grid = ['.'] * 81
+    for box in (box_units[0], box_units[4], box_units[8]):
+        for s, d in zip(box, rng.sample(digits, 9)):
+            grid[s] = d
+    return dlx.solve(''.join(grid))
+
+
+def dig(solution, rng, target=None, symmetry='none'):
+    """Take clues from solution, an orbit at a time in random order, keeping
+    each only if the puzzle would lose its unique solution without it. Stop
+    at target clues, if given. Return the puzzle."""
+    puzzle = list(solution)
+    n = 81
+    for orbit in rng.sample(ORBITS[symmetry], len(ORBITS[symmetry])):
+        if target is not None and n <= target:
+            break
+        kept = [puzzle[s] for s in orbit]
+        for s in orbit:
+            puzzle[s] = '.'
+        if dlx.count_solutions(''.join(puzzle), 2) == 1:
+            n -= len(orbit)
+        else:
+            for s, d in zip(orbit, kept):
+                puzzle[s] = d  ## Needed: put it back
+    return ''.join(puzzle)
+
+
+def make_puzzle(seed, target=None, symmetry='none', tries=100):
+    """A puzzle with one solution and at most target clues, made from seed;
+    None if tries full grids all stop above the target."""
+    rng = random.Random(seed)
+    for _ in range(tries):
+        puzzle = dig(random_solution(rng), rng, target, symmetry)
+        if target is None or clues(puzzle) <= target:
+            return puzzle
+    return None
+
+
+def clues(puzzle):
+    "The number of filled squares of puzzle."
+    return sum(c in digits for c in puzzle)
+
+
+################ Many puzzles ################
+
+def generate(n, target=None, symmetry='none', processes=1, seed=0, tries=100):
+    """Yield n unique puzzles, made from seeds seed, seed + 1, ... on processes
+    worker processes (None for one per core), in seed order."""
+    make = functools.partial(make_puzzle, target=target, symmetry=symmetry, tries=tries)
+    seeds = itertools.count(seed)
+    made = 0
+    while made < n:
+        todo = list(itertools.islice(seeds, n - made))
+        chunksize = max(1, min(64, len(todo) // (4 * (processes or os.cpu_count() or 1))))
+        before = made
+        for _, t, puzzle in batch.solve_stream(make, todo, processes, chunksize):
+            if puzzle:  ## Else every grid from this seed stopped above the target
+                made += 1
+                yield puzzle
+        if made == before:
+            raise ValueError('no puzzle with at most %s clues in %d grids' % (target, len(todo) * tries))
+
+
+def write(puzzles, filename):
+    """Write puzzles to filename as they come, packed if it ends in .bin (see
+    packed.py), else one per line. Return the number written."""
+    from . import packed
+    n = 0
+    if filename.endswith('.bin'):
+        with open(filename, 'wb') as out:
+            for puzzle in puzzles:
+                out.write(packed.pack(puzzle))
+                n += 1
+    else:
+        with open(filename, 'w') as out:
+            for puzzle in puzzles:
+                out.write(puzzle + '\n')
+                n += 1
+    return n
+
+
+################ System test ################
+
+def generate_file(filename, n, target=None, symmetry='none', processes=1, seed=0):
+    "Generate n puzzles into filename and report unique puzzles per second. Return that rate."
+    counts = {'min': 81, 'max': 0, 'sum': 0}
+
+    def counted(puzzles):
+        for puzzle in puzzles:
+            k = clues(puzzle)
+            counts['min'], counts['max'] = min(counts['min'], k), max(counts['max'], k)
+            counts['sum'] += k
+            yield puzzle
+
+    start = time.perf_counter()
+    write(counted(generate(n, target, symmetry, processes, seed)), filename)
+    t = time.perf_counter() - start
+    if not n:
+        print("Generated no puzzles.")
+        return 0.0
+    print("Generated %d unique puzzles (%d to %d clues, avg %.1f) in %.2f secs: %.1f unique puzzles/sec." % (
+        n, counts['min'], counts['max'], counts['sum'] / n, t, n / t))
+    return n / t
+
+
+if __name__ == '__main__':
+    test()
+    generate_file('generated.txt', 100)
+    generate_file('generated.txt', 100, target=28, symmetry='rotational')
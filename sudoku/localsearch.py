@@ -0,0 +1,475 @@
+## Local search over filled grids, scored incrementally
+
+## norvigHillClimbing.py fills each box with its missing digits and then swaps
+## squares inside boxes to remove the repeats in rows and columns, but it
+## copies the whole grid for every candidate swap and rescans all 18 rows and
+## columns to score each copy. Here the filled grid keeps, beside it, how many
+## times each digit appears in each row and each column. The cost of a grid
+## is the number of (row or column, digit) pairs missing, 0 for a solution,
+## and swapping two squares of a box changes only the counts of their two
+## rows and two columns, so delta() scores a swap with a few table lookups
+## and swap() makes it with a few increments.
+## Squares that constraint propagation alone settles (norvigBitmask.parse_grid)
+## are kept fixed along with the givens; only the others are ever swapped.
+## Two searches share these: hill_climb, which always takes the best swap and
+## starts again at a local minimum, and anneal, which tries random swaps and
+## also accepts some that raise the cost, more rarely as the temperature falls,
+## and starts again from a new fill when the cost stops falling. Both skip the
+## swaps that would put a digit where propagation has ruled it out.
+
+## Throughout this program we have:
+##   s is a square, e.g. 2 for 'A3' (see topology.py)
+##   k is a digit index, 0..8 for '1'..'9'
+##   values is a list of 81 digit indexes: a filled grid
+##   row_count[r][k] is how many times digit k appears in row r; col_count likewise
+##   free is a list, per box, of the squares that may be swapped
+##   rng is a random.Random
+##   stats is None, or a dict of counters that the search adds to
+##   schedule is a function from the iterations since the last (re)heat to a temperature
+##   seed is an int; random.Random(seed) is the rng of one attempt of a portfolio
+##   trace is None, or a list that anneal appends (iteration, seconds, cost, best cost,
+##   temperature) to as it goes
+
+import functools
+import math
+import multiprocessing
+import os
+import queue
+import random
+import time
+
+from .topology import digits, unitlist, box_units
+from . import batch
+from . import norvigBitmask
+from . import stream
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    rng = random.Random(0)
+    values, free = fill(norvigBitmask.parse_grid(grid2), rng)
+    row_count, col_count = counts(values)
+    total = cost(row_count, col_count)
+    for box in free:
+        for a in box:
+            for b in box:
+                if a < b:
+                    d = delta(values, row_count, col_count, a, b)
+                    swap(values, row_count, col_count, a, b)
+                    assert cost(row_count, col_count) == total + d
+                    assert (row_count, col_count) == counts(values)
+                    swap(values, row_count, col_count, a, b)
+    stats = new_stats()
+    assert solved(hill_climb(grid1, rng=rng, stats=stats)) and stats['steps'] == 0
+    assert solved(hill_climb(easy1, rng=random.Random(1), stats=stats))
+    assert stats['swaps_scored'] > 0
+    assert hill_climb('11' + '.' * 79) is False
+    trace = []
+    assert solved(anneal(easy1, rng=random.Random(2), stats=stats, trace=trace, trace_every=100))
+    assert trace and all(cost >= best >= 0 for i, t, cost, best, temp in trace)
+    assert anneal(easy1, rng=random.Random(2)) == anneal(easy1, rng=random.Random(2))
+    stats = new_stats()
+    assert anneal(grid2, max_iters=1000, stats=stats) is False and stats['iterations'] == 1000
+    assert open_after_propagation(grid2) and not open_after_propagation(grid1)
+    values, stats = search_counted(easy1, rng=random.Random(1))
+    assert values == hill_climb(easy1, rng=random.Random(1)) and stats['steps'] > 0
+    assert geometric(1.0, 0.5)(2) == 0.25 and linear(1.0, 4)(3) == 0.25
+    stats = {}
+    assert solved(portfolio(easy1, k=4, processes=2, search=anneal, stats=stats))
+    assert stats['seed'] in range(4) and stats['wall'] > 0
+    assert portfolio(grid2, k=3, processes=3, max_steps=2) is False
+    print('All tests pass.')
+
+
+################ Filling a Grid ################
+
+def fill(masks, rng):
+    """Return (values, free): the grid whose candidates are masks (from
+    norvigBitmask.parse_grid) filled so that every box holds each digit
+    once, at random apart from the squares already settled."""
+    values = [None] * 81
+    free = []
+    for box in box_units:
+        missing = set(range(9))
+        box_free = []
+        for s in box:
+            if norvigBitmask.popcount[masks[s]] == 1:
+                values[s] = norvigBitmask.popcount[masks[s] - 1]  ## Index of the single bit
+                missing.discard(values[s])
+            else:
+                box_free.append(s)
+        missing = sorted(missing)
+        rng.shuffle(missing)
+        for s, k in match(box_free, missing, masks).items():
+            values[s] = k
+        free.append(box_free)
+    return values, free
+
+
+def match(squares, ks, masks):
+    """Give each of squares one of the digits ks, as many of them as possible
+    one of its candidates in masks: a maximum bipartite matching, found by
+    augmenting paths, with the rest filled in with what is left over."""
+    owner = {}  ## Digit -> the square it is given to
+
+    def augment(s, seen):
+        for k in ks:
+            if masks[s] >> k & 1 and k not in seen:
+                seen.add(k)
+                if k not in owner or augment(owner[k], seen):
+                    owner[k] = s
+                    return True
+        return False
+
+    for s in squares:
+        augment(s, set())
+    given = dict((s, k) for k, s in owner.items())
+    left = [k for k in ks if k not in owner]
+    for s in squares:
+        if s not in given:
+            given[s] = left.pop()
+    return given
+
+
+def counts(values):
+    "The row_count and col_count tables of a filled grid."
+    row_count = [[0] * 9 for _ in range(9)]
+    col_count = [[0] * 9 for _ in range(9)]
+    for s, k in enumerate(values):
+        row_count[s // 9][k] += 1
+        col_count[s % 9][k] += 1
+    return row_count, col_count
+
+
+def cost(row_count, col_count):
+    "The number of digits missing from the rows and the columns; 0 when solved."
+    return sum(row.count(0) for row in row_count) + sum(col.count(0) for col in col_count)
+
+
+################ Swaps ################
+
+def delta(values, row_count, col_count, a, b):
+    """The change in cost from swapping squares a and b of the same box,
+    from the counts of their rows and columns alone."""
+    x, y = values[a], values[b]
+    ra, ca = divmod(a, 9)
+    rb, cb = divmod(b, 9)
+    d = 0
+    if ra != rb:
+        ## Row ra loses an x and gains a y; row rb the other way round.
+        d += ((row_count[ra][x] == 1) - (row_count[ra][y] == 0) +
+              (row_count[rb][y] == 1) - (row_count[rb][x] == 0))
+    if ca != cb:
+        d += ((col_count[ca][x] == 1) - (col_count[ca][y] == 0) +
+              (col_count[cb][y] == 1) - (col_count[cb][x] == 0))
+    return d
+
+
+def swap(values, row_count, col_count, a, b):
+    "Swap squares a and b, keeping the counts up to date."
+    x, y = values[a], values[b]
+    ra, ca = divmod(a, 9)
+    rb, cb = divmod(b, 9)
+    row_count[ra][x] -= 1
+    row_count[ra][y] += 1
+    row_count[rb][y] -= 1
+    row_count[rb][x] += 1
+    col_count[ca][x] -= 1
+    col_count[ca][y] += 1
+    col_count[cb][y] -= 1
+    col_count[cb][x] += 1
+    values[a], values[b] = y, x
+
+
+def box_pairs(free):
+    "Every pair of squares (a, b), a < b, that can be swapped within a box."
+    return [(a, b) for box in free for i, a in enumerate(box) for b in box[i + 1:]]
+
+
+################ Hill Climbing ################
+
+def new_stats():
+    "Counters for the local searches."
+    return {'steps': 0, 'restarts': 0, 'swaps_scored': 0,
+            'iterations': 0, 'accepted': 0, 'reheats': 0}
+
+
+def hill_climb(grid, max_steps=50000, max_sideways=50, rng=None, stats=None, cancel=None):
+    """Steepest descent: make the best swap of all, choosing at random among
+    equally good ones, as long as it does not raise the cost; after
+    max_sideways swaps in a row that do not lower it, start again from a new
+    random fill. Return the solution as a list of 81 digits, as in norvig.py,
+    or False if there is none within max_steps swaps, or once cancel (if
+    given, e.g. a multiprocessing.Event) is set."""
+    rng = rng or random.Random()
+    masks = norvigBitmask.parse_grid(grid)
+    if masks is False:
+        return False
+    values, free = fill(masks, rng)
+    row_count, col_count = counts(values)
+    pairs = box_pairs(free)
+    current = cost(row_count, col_count)
+    sideways = 0
+    for _ in range(max_steps):
+        if current == 0 or (cancel is not None and cancel.is_set()):
+            break
+        best, moves, scored = None, [], 0
+        for a, b in pairs:
+            if not (masks[a] >> values[b] & 1 and masks[b] >> values[a] & 1):
+                continue  ## A digit that propagation has ruled out of the square it would go to
+            scored += 1
+            d = delta(values, row_count, col_count, a, b)
+            if best is None or d < best:
+                best, moves = d, [(a, b)]
+            elif d == best:
+                moves.append((a, b))
+        if stats is not None:
+            stats['steps'] += 1
+            stats['swaps_scored'] += scored
+        sideways = sideways + 1 if best is None or best >= 0 else 0
+        if best is None or best > 0 or sideways > max_sideways:
+            ## A local minimum: start again.
+            values, free = fill(masks, rng)
+            row_count, col_count = counts(values)
+            current = cost(row_count, col_count)
+            sideways = 0
+            if stats is not None:
+                stats['restarts'] += 1
+            continue
+        swap(values, row_count, col_count, *rng.choice(moves))
+        current += best
+    if current != 0:
+        return False
+    return [digits[k] for k in values]
+
+
+################ Simulated Annealing ################
+
+def geometric(t0=0.5, alpha=0.998):
+    "Schedule: start at t0 and cool by a factor alpha every iteration."
+    return lambda i: t0 * alpha ** i
+
+
+def linear(t0=0.5, n=50000):
+    "Schedule: cool from t0 down to 0 in n iterations, then stay at 0."
+    return lambda i: t0 * max(0, n - i) / n
+
+
+def spread(values, row_count, col_count, boxes, masks, rng, n=200):
+    """The standard deviation of the change in cost over n random swaps of
+    the filled grid (those propagation allows): a starting temperature on
+    the scale of the grid's own moves, whatever the puzzle."""
+    ds = []
+    for _ in range(n if boxes else 0):
+        a, b = rng.sample(rng.choice(boxes), 2)
+        if masks[a] >> values[b] & 1 and masks[b] >> values[a] & 1:
+            ds.append(delta(values, row_count, col_count, a, b))
+    if len(ds) < 2:
+        return 0.5
+    mean = sum(ds) / len(ds)
+    return math.sqrt(sum((d - mean) ** 2 for d in ds) / (len(ds) - 1))
+
+
+def anneal(grid, schedule=None, reheat_after=1500, max_iters=2000000,
+           max_time=None, rng=None, stats=None, trace=None, trace_every=1000, cancel=None):
+    """Simulated annealing: swap two random squares of a random box, keeping
+    the swap if it does not raise the cost, or else with probability
+    exp(-delta / temperature). schedule defaults to geometric cooling from
+    the spread of the first fill's costs. After reheat_after iterations
+    without a new best cost, start again from a new random fill and the
+    schedule's first temperature. Stop after max_iters iterations or
+    max_time seconds (if given), or once cancel is set (checked every
+    trace_every iterations). Return the solution as a list of 81 digits, or
+    False if none was found in time."""
+    rng = rng or random.Random()
+    start = time.perf_counter()
+    masks = norvigBitmask.parse_grid(grid)
+    if masks is False:
+        return False
+    values, free = fill(masks, rng)
+    row_count, col_count = counts(values)
+    boxes = [box for box in free if len(box) > 1]
+    current = best = cost(row_count, col_count)
+    if schedule is None:
+        schedule = geometric(spread(values, row_count, col_count, boxes, masks, rng))
+    since_heat = since_best = accepted = i = 0
+    temperature = schedule(0)
+    for i in range(max_iters):
+        if current == 0 or not boxes:
+            break
+        if i % trace_every == 0:
+            elapsed = time.perf_counter() - start
+            if trace is not None:
+                trace.append((i, elapsed, current, best, temperature))
+            if max_time is not None and elapsed > max_time:
+                break
+            if cancel is not None and cancel.is_set():
+                break
+        a, b = rng.sample(rng.choice(boxes), 2)
+        if not (masks[a] >> values[b] & 1 and masks[b] >> values[a] & 1):
+            continue
+        d = delta(values, row_count, col_count, a, b)
+        if d <= 0 or (temperature > 0 and rng.random() < math.exp(-d / temperature)):
+            swap(values, row_count, col_count, a, b)
+            current += d
+            accepted += 1
+            if current < best:
+                best, since_best = current, 0
+        since_best += 1
+        since_heat += 1
+        if since_best > reheat_after:
+            ## Stuck in a valley: cooling again from there rarely gets out.
+            since_heat = since_best = 0
+            values, free = fill(masks, rng)
+            row_count, col_count = counts(values)
+            current = best = cost(row_count, col_count)
+            if stats is not None:
+                stats['reheats'] += 1
+        temperature = schedule(since_heat)
+    else:
+        i = max_iters  ## Ran them all
+    if stats is not None:
+        stats['iterations'] += i
+        stats['accepted'] += accepted
+    if trace is not None:
+        trace.append((i, time.perf_counter() - start, current, best, temperature))
+    if current != 0:
+        return False
+    return [digits[k] for k in values]
+
+
+################ Portfolio ################
+
+## K attempts of the same search, differing only in their seeds, share a few
+## worker processes. The first to find a solution hands it back and sets a
+## shared Event; the searches poll it and give up, and any worker still
+## running a moment later is terminated. A worker that dies without handing
+## anything back (exit code not 0) counts as one that failed, so a crash
+## can't leave the parent waiting forever.
+
+def portfolio(grid, k=None, processes=None, search=hill_climb, seeds=None, stats=None, **options):
+    """Run k seeded attempts of search (with options) on processes workers
+    (None for one per core; k defaults to the number of workers), and return
+    the first solution found, or False if every attempt fails. stats, if a
+    dict, gets the winning 'seed' and the 'wall' seconds taken."""
+    start = time.perf_counter()
+    processes = processes or os.cpu_count() or 1
+    seeds = list(seeds if seeds is not None else range(k or processes))
+    processes = min(processes, len(seeds))
+    cancel = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=attempts, daemon=True,
+                                       args=(search, grid, seeds[w::processes], options, cancel, results))
+               for w in range(processes)]
+    for worker in workers:
+        worker.start()
+    seed, values = None, False
+    received = 0  ## One message per worker: a solution, or (None, False) when it ran out of seeds
+    while received < len(workers):
+        try:
+            seed, values = results.get(timeout=0.1)
+        except queue.Empty:
+            crashed = sum(worker.exitcode not in (None, 0) for worker in workers)
+            if received + crashed >= len(workers):
+                seed, values = None, False
+                break  ## The others died without a word
+            continue
+        received += 1
+        if values:
+            break
+    cancel.set()
+    for worker in workers:
+        worker.join(0.1)
+        if worker.is_alive():
+            worker.terminate()
+            worker.join()
+    if stats is not None:
+        stats['seed'] = seed
+        stats['wall'] = time.perf_counter() - start
+    return values
+
+
+def attempts(search, grid, seeds, options, cancel, results):
+    "In a worker: try the seeds one after another until one solves grid or cancel is set."
+    for seed in seeds:
+        if cancel.is_set():
+            break
+        values = search(grid, rng=random.Random(seed), cancel=cancel, **options)
+        if values:
+            results.put((seed, values))
+            return
+    results.put((None, False))
+
+
+################ System test ################
+
+## Propagation alone solves many puzzles of a corpus (44 of 100sudoku), and
+## for those fill() leaves nothing to swap. Report the local searches on the
+## others, where they do the work.
+
+def open_after_propagation(grid):
+    "Whether norvigBitmask.parse_grid leaves squares of grid open (and finds no contradiction)."
+    masks = norvigBitmask.parse_grid(grid)
+    return masks is not False and any(v & (v - 1) for v in masks)
+
+
+def search_counted(grid, search=hill_climb, **options):
+    "Solve grid by search (hill_climb or anneal, with options); return (values, its stats for this grid)."
+    stats = new_stats()
+    return search(grid, stats=stats, **options), stats
+
+
+def solve_all(grids, name='', search=hill_climb, processes=1, **options):
+    """Attempt to solve a sequence of grids by local search (hill_climb or
+    anneal, with options), on processes worker processes (None for one per
+    core). Report results, and the search's counts."""
+    totals = stream.new_totals()
+    stats = new_stats()
+    start = time.perf_counter()
+    for grid, t, (values, puzzle_stats) in batch.solve_stream(
+            functools.partial(search_counted, search=search, **options), grids, processes):
+        stream.add_counts(stats, puzzle_stats)
+        stream.add(totals, t, solved(values), grid)
+    wall = time.perf_counter() - start if processes != 1 else None
+    if totals['N'] > 1:
+        print(stream.summary(totals, name, wall))
+        print(stream.latency(totals))
+        if search is hill_climb:
+            print("  %(steps)d swaps made, %(swaps_scored)d swaps scored, %(restarts)d restarts." % stats)
+        elif search is anneal:
+            print("  %(iterations)d iterations, %(accepted)d swaps accepted, %(reheats)d reheats." % stats)
+
+
+def show_trace(trace, lines=20):
+    "Print about lines rows of an anneal trace: how the cost fell over time."
+    print('%10s %8s %6s %6s %12s' % ('iteration', 'secs', 'cost', 'best', 'temperature'))
+    for i, t, cost, best, temperature in trace[::max(1, len(trace) // lines)] + trace[-1:]:
+        print('%10d %8.3f %6d %6d %12.6f' % (i, t, cost, best, temperature))
+
+
+def solved(values):
+    "A puzzle is solved if each unit is a permutation of the digits 1 to 9."
+
+    def unitsolved(unit): return set(values[s] for s in unit) == set(digits)
+
+    return values is not False and all(unitsolved(unit) for unit in unitlist)
+
+
+def from_file(filename, sep='\n'):
+    "Parse a file into a list of strings, separated by sep."
+    return open(filename).read().strip().split(sep)
+
+
+grid1 = '003020600900305001001806400008102900700000008006708200002609500800203009005010300'
+grid2 = '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......'
+easy1 = '406010000020000100500207000600001800000030509080000300030060210000000050000350408'
+
+if __name__ == '__main__':
+    test()
+    hard = [grid for grid in from_file("100sudoku.txt") if open_after_propagation(grid)]
+    solve_all(hard, "hard (open after propagation)")
+    solve_all(hard, "hard (open after propagation, annealing)", anneal, max_time=5.0)
+    # solve_all(from_file("top95.txt"), "95sudoku")
+    # trace = []; anneal(from_file("top95.txt")[0], rng=random.Random(0), trace=trace); show_trace(trace)
@@ -0,0 +1,404 @@
+## Solve Every Sudoku Puzzle
+
+## See http://norvig.com/sudoku.html
+
+## Throughout this program we have:
+##   r is a row,    e.g. 'A'
+##   c is a column, e.g. '3'
+##   s is a square, e.g. 2 for 'A3' (see topology.py)
+##   d is a digit,  e.g. '9'
+##   u is a unit,   e.g. (0, 9, 18, 27, 36, 45, 54, 63, 72) for 'A1'..'I1'
+##   grid is a grid,e.g. 81 non-blank chars, e.g. starting with '.18...7...
+##   values is a list of possible values, e.g. ['12349', '8', ...]
+
+import itertools
+
+from .topology import digits, rows, cols, squares, index, unitlist, units, peers
+from . import batch
+from . import trail
+from . import dlx
+from . import cache
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    assert len(squares) == 81
+    assert len(unitlist) == 27
+    assert all(len(units[s]) == 3 for s in range(81))
+    assert all(len(peers[s]) == 20 for s in range(81))
+    assert [[squares[s] for s in u] for u in units[index['C2']]] == \
+           [['A2', 'B2', 'C2', 'D2', 'E2', 'F2', 'G2', 'H2', 'I2'],
+            ['C1', 'C2', 'C3', 'C4', 'C5', 'C6', 'C7', 'C8', 'C9'],
+            ['A1', 'A2', 'A3', 'B1', 'B2', 'B3', 'C1', 'C2', 'C3']]
+    assert set(squares[s] for s in peers[index['C2']]) == \
+           set(['A2', 'B2', 'D2', 'E2', 'F2', 'G2', 'H2', 'I2',
+                'C1', 'C3', 'C4', 'C5', 'C6', 'C7', 'C8', 'C9',
+                'A1', 'A3', 'B1', 'B3'])
+    top = '48.3............71.2.......7.5....6....2..8.............1.76...3.....4......5....'  ## top95's 4th
+    values, counts = solve_counted(top)
+    assert values == solve(top) and counts['nodes'] > 1 and 0 < counts['backtracks'] < counts['nodes']
+    assert counts['removed_last_value'] > 0 and counts['no_place_for_value'] > 0
+    assert counts['eliminate'] > counts['assign'] > 0 and 0 < counts['max_depth'] < counts['nodes']
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(4) as pool:  ## Each solve counts in its own dict
+        assert list(pool.map(solve_counted, [top] * 4)) == [(values, counts)] * 4
+    assert solve(hard1, max_nodes=3) is batch.TIMED_OUT and not solved(batch.TIMED_OUT)
+    assert solve(grid2, max_nodes=100) == solve(grid2)  ## grid2 takes 16 nodes
+    assert solve(hard1, max_time=0.0) is batch.TIMED_OUT  ## Out of time at the first clock check
+    assert solve(grid2, max_time=0.0) in (batch.TIMED_OUT, solve(grid2))  ## Checked every CHECK_EVERY nodes
+    assert solve_counted(hard1, max_nodes=3)[0] is batch.TIMED_OUT
+    assert next(solutions(grid2)) == solve(grid2) and unique(grid2) and unique(grid1)
+    assert count_solutions('.' * 81, limit=5) == 5 and count_solutions('11' + '.' * 79) == 0
+    assert count_solutions(twins, limit=10) == 4 and count_solutions(twins, limit=3) == 3 and not unique(twins)
+    assert all(solved(values) for values in itertools.islice(solutions('.' * 81), 10))
+    values, counts = solve_counted('11' + '.' * 79)  ## Fails in parse_grid: no search
+    assert values is False and counts['nodes'] == 0 and counts['removed_last_value'] == 1
+    print('All tests pass.')
+
+
+################ Parse a Grid ################
+
+def parse_grid(grid, counts=None):
+    """Convert grid to a list of possible values, [digits, ...], or
+    return False if a contradiction is detected. (counts: see new_counts.)"""
+    ## To start, every square can be any digit; then assign values from the grid.
+    values = [digits] * 81
+    for s, d in enumerate(grid_values(grid)):
+        if d in digits and not assign(values, s, d, counts):
+            return False  ## (Fail if we can't assign d to square s.)
+    return values
+
+
+def grid_values(grid):
+    "Convert grid into a list of 81 chars with '0' or '.' for empties."
+    chars = [c for c in grid if c in digits or c in '0.']
+    assert len(chars) == 81
+    return chars
+
+
+################ Constraint Propagation ################
+
+def assign(values, s, d, counts=None):
+    """Eliminate all the other values (except d) from values[s] and propagate.
+    Return values, except return False if a contradiction is detected."""
+    if counts is not None:
+        counts['assign'] += 1
+    other_values = values[s].replace(d, '')
+    if all(eliminate(values, s, d2, counts) for d2 in other_values):
+        return values
+    else:
+        return False
+
+
+def eliminate(values, s, d, counts=None):
+    """Eliminate d from values[s]; propagate when values or places <= 2.
+    Return values, except return False if a contradiction is detected."""
+    if counts is not None:
+        counts['eliminate'] += 1
+    if d not in values[s]:
+        return values  ## Already eliminated
+    values[s] = values[s].replace(d, '')
+    ## (1) If a square s is reduced to one value d2, then eliminate d2 from the peers.
+    if len(values[s]) == 0:
+        if counts is not None:
+            counts['removed_last_value'] += 1
+        return False  ## Contradiction: removed last value
+    elif len(values[s]) == 1:
+        d2 = values[s]
+        if not all(eliminate(values, s2, d2, counts) for s2 in peers[s]):
+            return False
+    ## (2) If a unit u is reduced to only one place for a value d, then put it there.
+    for u in units[s]:
+        dplaces = [s for s in u if d in values[s]]
+        if len(dplaces) == 0:
+            if counts is not None:
+                counts['no_place_for_value'] += 1
+            return False  ## Contradiction: no place for this value
+        elif len(dplaces) == 1:
+            # d can only be in one place in unit; assign it there
+            if not assign(values, dplaces[0], d, counts):
+                return False
+    return values
+
+
+################ Display as 2-D grid ################
+
+def display(values):
+    "Display these values as a 2-D grid."
+    width = 1 + max(len(v) for v in values)
+    line = '+'.join(['-' * (width * 3)] * 3)
+    for r in rows:
+        print(''.join(values[index[r + c]].center(width) + ('|' if c in '36' else ''))
+              for c in cols)
+        if r in 'CF': print(line)
+
+
+################ Search ################
+
+def solve(grid, engine='norvig', max_nodes=None, max_time=None):
+    """Solve grid with one of the engines: 'norvig' (search below), 'trail'
+    (trail.py), 'dlx' (dlx.py) or 'cached' (norvig's search behind
+    solution_cache, see cache.py). Each returns values or False.
+    Given max_nodes search nodes or max_time seconds, norvig's search gives
+    up when they are used up and returns batch.TIMED_OUT instead."""
+    if max_nodes is None and max_time is None:
+        return engines[engine](grid)
+    if engine != 'norvig':
+        raise ValueError('only the norvig engine takes a budget, not %r' % engine)
+    budget = batch.new_budget(max_nodes, max_time)
+    try:
+        return search(parse_grid(grid), budget)
+    except batch.OutOfBudget:
+        return batch.TIMED_OUT
+
+
+## Same search without values.copy(): see trail.py. Pass stats=trail.new_stats()
+## to count the copies it avoided.
+def solve_trail(grid, stats=None): return trail.search(parse_grid(grid), trail.mrv, stats)
+
+
+def search(values, budget=None, counts=None, depth=1):
+    """Using depth-first search and propagation, try all possible values
+    (spending budget, if any). If counts is given (see new_counts), add to
+    it what the search does; depth is the depth of this node."""
+    if values is False:
+        return False  ## Failed earlier
+    if budget is not None:
+        batch.spend(budget)
+    if counts is not None:
+        counts['nodes'] += 1
+        counts['max_depth'] = max(counts['max_depth'], depth)
+    if all(len(v) == 1 for v in values):
+        return values  ## Solved!
+    ## Chose the unfilled square s with the fewest possibilities
+    n, s = min((len(v), s) for s, v in enumerate(values) if len(v) > 1)
+    if counts is None:
+        return some(search(assign(values.copy(), s, d), budget)
+                    for d in values[s])
+    for d in values[s]:
+        result = search(assign(values.copy(), s, d, counts), budget, counts, depth + 1)
+        if result:
+            return result
+    counts['backtracks'] += 1  ## Every guess here failed: this node is abandoned, once
+    return False
+
+
+engines = {'norvig': lambda grid: search(parse_grid(grid)),
+           'trail': solve_trail,
+           'dlx': dlx.solve,
+           'cached': lambda grid: cache.solve(grid, solution_cache, engines['norvig'])}
+
+## Shared by every 'cached' solve in this process; its 'hits' and 'misses' count them.
+solution_cache = cache.new_cache()
+
+
+################ Every solution ################
+
+## search stops at the first solution. solutions goes on: it makes the same
+## choices with the same propagation, and yields each solution as it reaches
+## it, so a caller that stops early pays only for the part of the tree it
+## has seen. count_solutions stops at limit; with limit=2, proving that a
+## puzzle is unique costs one solve plus the rest of the search tree, which
+## propagation mostly closes off at once.
+
+def solutions(grid):
+    "Lazily yield every solution of grid (none if it has a contradiction)."
+    return search_all(parse_grid(grid))
+
+
+def search_all(values):
+    "Yield every solution below values, in the order search would find them."
+    if values is False:
+        return  ## Failed earlier
+    if all(len(v) == 1 for v in values):
+        yield values  ## Solved!
+        return
+    n, s = min((len(v), s) for s, v in enumerate(values) if len(v) > 1)
+    for d in values[s]:
+        yield from search_all(assign(values.copy(), s, d))
+
+
+def count_solutions(grid, limit=2):
+    "The number of solutions of grid, counting no further than limit."
+    return sum(1 for _ in itertools.islice(solutions(grid), limit))
+
+
+def unique(grid):
+    "Does grid have exactly one solution?"
+    return count_solutions(grid, 2) == 1
+
+
+################ Instrumentation ################
+
+## The counters are passed down through search, assign and eliminate, as
+## norvigBitmask.py and trail.py pass theirs: each solve has its own dict, so
+## counted solves can run side by side in threads, and an exception leaves
+## nothing to put back. An ordinary solve passes None and counts nothing.
+
+def new_counts():
+    """Counters for instrumented solves: search nodes, backtracks (nodes
+    abandoned when every guess below them failed, each counted once; a guess
+    that propagation refutes at once is no node, and shows only as a
+    contradiction), assign and eliminate calls, the deepest search, and the
+    contradictions each rule found: (1) a square lost its last value,
+    (2) a value has no place left in a unit."""
+    return {'nodes': 0, 'backtracks': 0, 'assign': 0, 'eliminate': 0, 'max_depth': 0,
+            'removed_last_value': 0, 'no_place_for_value': 0}
+
+
+def solve_counted(grid, max_nodes=None, max_time=None):
+    """Solve grid as solve(grid, 'norvig', max_nodes, max_time) does, counting
+    what the search does. Return (values, counts)."""
+    counts = new_counts()
+    budget = batch.new_budget(max_nodes, max_time)
+    try:
+        values = search(parse_grid(grid, counts), budget, counts)
+    except batch.OutOfBudget:
+        values = batch.TIMED_OUT
+    return values, counts
+
+
+################ Utilities ################
+
+def some(seq):
+    "Return some element of seq that is true."
+    for e in seq:
+        if e: return e
+    return False
+
+
+def from_file(filename, sep='\n'):
+    "Parse a file into a list of strings, separated by sep."
+    return open(filename).read().strip().split(sep)
+
+
+def shuffled(seq):
+    "Return a randomly shuffled copy of the input sequence."
+    seq = list(seq)
+    random.shuffle(seq)
+    return seq
+
+
+################ System test ################
+
+import functools
+import time, random
+
+from . import stream
+
+
+def solve_all(grids, name='', showif=0.0, engine='norvig', processes=1, counters=False,
+              slowest=5, latency_json=None, max_nodes=None, max_time=None):
+    """Attempt to solve a sequence of grids. Report results.
+    When showif is a number of seconds, display puzzles that take longer.
+    When showif is None, don't display any puzzles.
+    When processes is not 1, solve the grids in chunks on that many worker
+    processes (None for one per core); the report covers them all in order.
+    grids can be any iterable, e.g. stream.read_grids(filename): each grid
+    is solved as it is read, and only running totals are kept.
+    When counters is true, solve with norvig's search instrumented (see
+    solve_counted): show each displayed puzzle's counts, and their totals.
+    The report ends with latency percentiles and the slowest puzzles (see
+    stream.latency); when latency_json is a filename, it is saved there too.
+    With max_nodes or max_time, each puzzle gets that budget (see solve);
+    the puzzles that use it up are reported as timed out, not unsolved."""
+    if counters:
+        solver = functools.partial(solve_counted, max_nodes=max_nodes, max_time=max_time)
+    else:
+        solver = functools.partial(solve, engine=engine, max_nodes=max_nodes, max_time=max_time)
+    totals = stream.new_totals(slowest)
+    counts = new_counts()
+    start = time.perf_counter()
+    for grid, t, values in batch.solve_stream(solver, grids, processes):
+        if counters:
+            values, puzzle_counts = values
+            stream.add_counts(counts, puzzle_counts)
+        ## Display puzzles that take long enough
+        if showif is not None and t > showif:
+            display(grid_values(grid))
+            if values: display(values)
+            print('(%.2f seconds)\n' % t)
+            if counters:
+                print(stream.counts_line(puzzle_counts) + '\n')
+        stream.add(totals, t, solved(values), grid, values is batch.TIMED_OUT)
+    wall = time.perf_counter() - start if processes != 1 else None
+    if totals['N'] > 1:
+        print(stream.summary(totals, name, wall))
+        print(stream.latency(totals))
+        if counters:
+            print('  ' + stream.counts_line(counts))
+    if latency_json:
+        stream.save([stream.report(totals, name, wall)], latency_json)
+
+
+def compare_engines(grids, name='', names=('norvig', 'dlx')):
+    """Time every engine in names on each grid and report them side by side,
+    with the number of puzzles each engine was fastest on."""
+    times = dict((e, []) for e in names)
+    results = dict((e, []) for e in names)
+    wins = dict((e, 0) for e in names)
+    for grid in grids:
+        for e in names:
+            start = time.perf_counter()
+            values = solve(grid, e)
+            times[e].append(time.perf_counter() - start)
+            results[e].append(solved(values))
+        wins[min(names, key=lambda e: times[e][-1])] += 1
+    N = len(grids)
+    print("%d %s puzzles:" % (N, name))
+    print("  %-8s %8s %10s %8s %10s %8s" % ('engine', 'solved', 'avg secs', 'Hz', 'max secs', 'fastest'))
+    for e in names:
+        print("  %-8s %8d %10.4f %8d %10.4f %8d" % (
+            e, sum(results[e]), sum(times[e]) / N, N / sum(times[e]), max(times[e]), wins[e]))
+
+
+def solved(values):
+    "A puzzle is solved if each unit is a permutation of the digits 1 to 9."
+
+    def unitsolved(unit): return set(values[s] for s in unit) == set(digits)
+
+    return bool(values) and all(unitsolved(unit) for unit in unitlist)
+
+
+def random_puzzle(N=17):
+    """Make a random puzzle with N or more assignments. Restart on contradictions.
+    Note the resulting puzzle is not guaranteed to be solvable, but empirically
+    about 99.8% of them are solvable. Some have multiple solutions: keep the
+    ones where unique(puzzle) is true if that matters."""
+    values = [digits] * 81
+    for s in shuffled(range(81)):
+        if not assign(values, s, random.choice(values[s])):
+            break
+        ds = [v for v in values if len(v) == 1]
+        if len(ds) >= N and len(set(ds)) >= 8:
+            return ''.join(v if len(v) == 1 else '.' for v in values)
+    return random_puzzle(N)  ## Give up and make a new puzzle
+
+
+grid1 = '003020600900305001001806400008102900700000008006708200002609500800203009005010300'
+grid2 = '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......'
+hard1 = '.....6....59.....82....8....45........3........6..3.54...325..6..................'
+## grid1's solution with two unavoidable rectangles blanked: 4 solutions
+twins = '4.3921.579.7345.21251876493548132976729564138136798245372689514.142537.9.954173.2'
+
+if __name__ == '__main__':
+    test()
+    solve_all(from_file("top95.txt"), "95sudoku", None)
+    # solve_all(from_file("easy50.txt", '========'), "easy", None)
+    # solve_all(from_file("easy50.txt", '========'), "easy", None)
+    solve_all(from_file("100sudoku.txt"), "hard", None)
+    solve_all(from_file("1000sudoku.txt"), "hard", None)
+    # solve_all(from_file("hardest.txt"), "hardest", None)
+    # solve_all([random_puzzle() for _ in range(99)], "random", 100.0, max_time=10.0)
+    # solve_all(from_file("1000sudoku.txt"), "hard", None, processes=None)
+    # solve_all(stream.read_grids("1000sudoku.txt"), "hard", None)
+    # solve_all(from_file("top95.txt"), "95sudoku", 0.1, counters=True)
+    # compare_engines(from_file("top95.txt"), "95sudoku", ('norvig', 'trail', 'dlx'))
+
+## References used:
+## http://www.scanraid.com/BasicStrategies.htm
+## http://www.sudokudragon.com/sudokustrategy.htm
+## http://www.krazydad.com/blog/2005/09/29/an-index-of-sudoku-strategies/
+## http://www2.warwick.ac.uk/fac/sci/moac/currentstudents/peter_cock/python/sudoku/
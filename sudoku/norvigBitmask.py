@@ -0,0 +1,281 @@
+## Solve Every Sudoku Puzzle, with bitmask candidate sets
+
+## See http://norvig.com/sudoku.html
+
+## Same constraint propagation and search as norvig.py, but the candidates
+## are no longer strings. The 81 squares live in a flat list indexed 0..80,
+## and each entry is a 9-bit integer mask: bit k is set when digit k+1 is
+## still possible. Eliminating a digit is then a single xor, and counting
+## or reading candidates goes through the precomputed tables below.
+
+## Throughout this program we have:
+##   s is a square index, e.g. 19 for 'C2'
+##   d is a digit bit,    e.g. 4 (0b000000100) for '3'
+##   u is a unit,         e.g. (0, 9, 18, 27, 36, 45, 54, 63, 72)
+##   grid is a grid,e.g. 81 non-blank chars, e.g. starting with '.18...7...
+##   values is a list of 81 masks, e.g. [0b100001111, 128, ...]
+
+from .topology import (digits, rows, cols, squares, unitlist, unit_indexes,
+                      unit_bits, ALL_UNITS, peers)
+
+ALL = (1 << 9) - 1  ## Every digit still possible
+popcount = [bin(m).count('1') for m in range(ALL + 1)]
+bit_digit = [''] * (ALL + 1)  ## Single-bit mask -> digit char, '' otherwise
+digit_bit = {}  ## Digit char -> single-bit mask
+for k, c in enumerate(digits):
+    bit_digit[1 << k] = c
+    digit_bit[c] = 1 << k
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    assert popcount[0b100100101] == 4 and popcount[ALL] == 9
+    assert bit_digit[digit_bit['7']] == '7' and bit_digit[3] == ''
+    assert solved(solve(grid1)) and solved(solve(grid2))
+    assert as_dict(solve(grid1))['A1'] == '4'
+    counts = {'nodes': 0, 'backtracks': 0}
+    assert solved(search(parse_grid(grid2), counts)) and 0 < counts['backtracks'] < counts['nodes']
+    print('All tests pass.')
+
+
+################ Parse a Grid ################
+
+def parse_grid(grid):
+    """Convert grid to a list of candidate masks, [mask, ...], or
+    return False if a contradiction is detected."""
+    ## Rather than assign the given digits one at a time, collect the digits
+    ## used in each unit, start every other square from what its three units
+    ## leave open, and propagate the whole grid once.
+    chars = grid_chars(grid)
+    used = [0] * len(unitlist)
+    for s, c in enumerate(chars):
+        if c in digit_bit:
+            d = digit_bit[c]
+            for i in unit_indexes[s]:
+                if used[i] & d:
+                    return False  ## Contradiction: d given twice in a unit
+                used[i] |= d
+    values = [ALL] * 81
+    fixed = []
+    for s, c in enumerate(chars):
+        if c in digit_bit:
+            values[s] = digit_bit[c]
+        else:
+            i, j, k = unit_indexes[s]
+            v = ALL & ~(used[i] | used[j] | used[k])
+            if not v:
+                return False  ## Contradiction: no value left for s
+            values[s] = v
+            if not v & (v - 1):
+                fixed.append(s)
+    return propagate(values, fixed, ALL_UNITS)
+
+
+def grid_chars(grid):
+    "Convert grid into a list of 81 chars with '0' or '.' for empties."
+    chars = [c for c in grid if c in digits or c in '0.']
+    assert len(chars) == 81
+    return chars
+
+
+def grid_values(grid):
+    "Convert grid into a dict of {square: char} with '0' or '.' for empties."
+    return dict(zip(squares, grid_chars(grid)))
+
+
+def as_dict(values):
+    "Convert a list of masks into norvig.py's {square: digits} form."
+    return dict((squares[s], bit_digit[v] or
+                 ''.join(digits[k] for k in range(9) if v >> k & 1))
+                for s, v in enumerate(values))
+
+
+################ Constraint Propagation ################
+
+def assign(values, s, d):
+    """Eliminate all the other values (except d) from values[s] and propagate.
+    Return values, except return False if a contradiction is detected."""
+    if not values[s] & d:
+        return False  ## d was already ruled out here
+    values[s] = d
+    return propagate(values, [s], unit_bits[s])
+
+
+def eliminate(values, s, d):
+    """Eliminate d from values[s] and propagate.
+    Return values, except return False if a contradiction is detected."""
+    v = values[s]
+    if not v & d:
+        return values  ## Already eliminated
+    v ^= d
+    if not v:
+        return False  ## Contradiction: removed last value
+    values[s] = v
+    return propagate(values, [s] if popcount[v] == 1 else [], unit_bits[s])
+
+
+def propagate(values, fixed, dirty=ALL_UNITS, peers=peers, unitlist=unitlist,
+              unit_bits=unit_bits, ALL=ALL):
+    """Run both of norvig.py's rules to a fixpoint. fixed lists the squares
+    just reduced to one value, and dirty has bit i set when unitlist[i] lost
+    a candidate somewhere. Return values, or False on a contradiction."""
+    while True:
+        ## (1) If a square s is reduced to one value d, then eliminate d from the peers.
+        while fixed:
+            s = fixed.pop()
+            d = values[s]
+            for s2 in peers[s]:
+                if values[s2] & d:
+                    v = values[s2] ^ d
+                    if not v:
+                        return False  ## Contradiction: removed last value
+                    values[s2] = v
+                    dirty |= unit_bits[s2]
+                    if not v & (v - 1):
+                        fixed.append(s2)
+        if not dirty:
+            return values
+        ## (2) If a unit u has only one place for a value d, then put it there.
+        ## Only units that lost a candidate can have gained such a place.
+        ## once/twice collect the digits seen at least once/twice in the unit,
+        ## placed the ones already settled in a square of their own.
+        while dirty:
+            bit = dirty & -dirty
+            dirty ^= bit
+            u = unitlist[bit.bit_length() - 1]
+            once = twice = placed = 0
+            for s in u:
+                v = values[s]
+                if v & (v - 1):
+                    twice |= once & v
+                    once |= v
+                else:
+                    placed |= v
+            if once | placed != ALL:
+                return False  ## Contradiction: no place for some value
+            hidden = once & ~twice & ~placed
+            if hidden:
+                for s in u:
+                    v = values[s]
+                    d = v & hidden
+                    if d and d != v:
+                        if d & (d - 1):
+                            return False  ## Two values with only this place
+                        values[s] = d
+                        dirty |= unit_bits[s]
+                        fixed.append(s)
+
+
+################ Display as 2-D grid ################
+
+def display(values):
+    "Display these values as a 2-D grid."
+    if isinstance(values, list):
+        values = as_dict(values)
+    width = 1 + max(len(values[s]) for s in squares)
+    line = '+'.join(['-' * (width * 3)] * 3)
+    for r in rows:
+        print(''.join(values[r + c].center(width) + ('|' if c in '36' else '')
+                      for c in cols))
+        if r in 'CF': print(line)
+
+
+################ Search ################
+
+def solve(grid): return search(parse_grid(grid))
+
+
+def search(values, counts=None):
+    """Using depth-first search and propagation, try all possible values.
+    If counts is given, a dict {'nodes', 'backtracks'}, add to it the nodes
+    searched and the nodes abandoned when every guess below them failed,
+    each once, as norvig.new_counts counts them."""
+    if values is False:
+        return False  ## Failed earlier
+    if counts is not None:
+        counts['nodes'] += 1
+    ## Chose the unfilled square s with the fewest possibilities
+    n, s = 10, None
+    for s2, v in enumerate(values):
+        n2 = popcount[v]
+        if 1 < n2 < n:
+            n, s = n2, s2
+            if n == 2:
+                break  ## Can't do better than two; same pick as min()
+    if s is None:
+        return values  ## Solved!
+    ds = values[s]
+    while ds:
+        d = ds & -ds
+        result = search(assign(values[:], s, d), counts)
+        if result:
+            return result
+        ds ^= d
+    if counts is not None:
+        counts['backtracks'] += 1  ## Every guess here failed: this node is abandoned, once
+    return False
+
+
+################ Utilities ################
+
+def from_file(filename, sep='\n'):
+    "Parse a file into a list of strings, separated by sep."
+    return open(filename).read().strip().split(sep)
+
+
+################ System test ################
+
+import time
+
+from . import batch
+from . import stream
+
+
+def solve_all(grids, name='', showif=0.0, processes=1):
+    """Attempt to solve a sequence of grids. Report results.
+    When showif is a number of seconds, display puzzles that take longer.
+    When showif is None, don't display any puzzles.
+    When processes is not 1, solve the grids in chunks on that many worker
+    processes (None for one per core); the report covers them all in order.
+    grids can be any iterable, e.g. stream.read_grids(filename): each grid
+    is solved as it is read, and only running totals are kept."""
+    totals = stream.new_totals()
+    start = time.perf_counter()
+    for grid, t, values in batch.solve_stream(solve, grids, processes):
+        ## Display puzzles that take long enough
+        if showif is not None and t > showif:
+            display(grid_values(grid))
+            if values: display(values)
+            print('(%.2f seconds)\n' % t)
+        stream.add(totals, t, solved(values), grid)
+    wall = time.perf_counter() - start if processes != 1 else None
+    if totals['N'] > 1:
+        print(stream.summary(totals, name, wall))
+        print(stream.latency(totals))
+
+
+def solved(values):
+    "A puzzle is solved if each unit is a permutation of the digits 1 to 9."
+
+    def unitsolved(unit):
+        seen = 0
+        for s in unit:
+            if popcount[values[s]] != 1:
+                return False
+            seen |= values[s]
+        return seen == ALL
+
+    return values is not False and all(unitsolved(unit) for unit in unitlist)
+
+
+grid1 = '003020600900305001001806400008102900700000008006708200002609500800203009005010300'
+grid2 = '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......'
+hard1 = '.....6....59.....82....8....45........3........6..3.54...325..6..................'
+
+if __name__ == '__main__':
+    test()
+    solve_all(from_file("top95.txt"), "95sudoku", None)
+    solve_all(from_file("100sudoku.txt"), "hard", None)
+    solve_all(from_file("1000sudoku.txt"), "hard", None)
@@ -0,0 +1,299 @@
+## Solve Every Sudoku Puzzle
+import functools
+
+
+## See http://norvig.com/sudoku.html
+
+## Throughout this program we have:
+##   r is a row,    e.g. 'A'
+##   c is a column, e.g. '3'
+##   s is a square, e.g. 2 for 'A3' (see topology.py)
+##   d is a digit,  e.g. '9'
+##   u is a unit,   e.g. (0, 9, 18, 27, 36, 45, 54, 63, 72) for 'A1'..'I1'
+##   grid is a grid,e.g. 81 non-blank chars, e.g. starting with '.18...7...
+##   values is a list of possible values, e.g. ['12349', '8', ...]
+
+
+from .topology import digits, rows, cols, squares, index, unitlist, units, peers
+from . import trail
+
+
+MAX_SUBSET = 2  ## The largest naked subsets looked for: 2 for pairs, 3 with triples, 4 with quads
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    assert len(squares) == 81
+    assert len(unitlist) == 27
+    assert all(len(units[s]) == 3 for s in range(81))
+    assert all(len(peers[s]) == 20 for s in range(81))
+    assert [[squares[s] for s in u] for u in units[index['C2']]] == \
+           [['A2', 'B2', 'C2', 'D2', 'E2', 'F2', 'G2', 'H2', 'I2'],
+            ['C1', 'C2', 'C3', 'C4', 'C5', 'C6', 'C7', 'C8', 'C9'],
+            ['A1', 'A2', 'A3', 'B1', 'B2', 'B3', 'C1', 'C2', 'C3']]
+    assert set(squares[s] for s in peers[index['C2']]) == \
+           set(['A2', 'B2', 'D2', 'E2', 'F2', 'G2', 'H2', 'I2',
+                'C1', 'C3', 'C4', 'C5', 'C6', 'C7', 'C8', 'C9',
+                'A1', 'A3', 'B1', 'B3'])
+    values = [digits] * 81
+    for s in (0, 1):  ## A1 and A2 become a pair '12' in row A and the top left box
+        assert all(eliminate_naked_pairs(values, s, d) for d in '3456789')
+    assert values[2] == values[9] == '3456789' and values[27] == digits
+    assert naked_subset(['12', '23', '13'] + ['4'] * 6, 0, range(9), 3) == (set('123'), [0, 1, 2])
+    assert naked_subset(['12', '23', '13'] + ['4'] * 6, 0, range(9)) is None  ## Triples need max_subset 3
+    assert naked_subset(['12', '12', '12'] + ['4'] * 6, 0, range(9))[0] == set('12')
+    assert solved(solve_naked_pairs(grid2)) and solve_naked_pairs('11' + '.' * 79) is False
+    assert solve_naked_pairs(grid2, 1) == solve_naked_pairs(grid2, 4) == solve_naked_pairs(grid2)
+    found = naked_subset_rule(['12', '12', '123'] + [digits] * 78, 0)  ## The pair A1 A2, in row A and box 1
+    assert (2, '1') in found and (9, '2') in found and all(s not in (0, 1) and d in '12' for s, d in found)
+    stats = trail.new_stats()
+    top = '48.3............71.2.......7.5....6....2..8.............1.76...3.....4......5....'  ## top95's 4th
+    for grid in (grid1, grid2, top):  ## Same propagation, same branches, same solution
+        assert solve_naked_pairs_trail(grid, stats) == solve_naked_pairs(grid)
+    assert stats['copies_avoided'] > 0 and solve_naked_pairs_trail('11' + '.' * 79) is False
+    assert solve_naked_pairs_trail(top, max_subset=3) == solve_naked_pairs(top, 3)
+    print('All tests pass.')
+
+
+################ Parse a Grid ################
+
+def parse_grid(grid, max_subset=MAX_SUBSET):
+    """Convert grid to a list of possible values, [digits, ...], or
+    return False if a contradiction is detected."""
+    ## To start, every square can be any digit; then assign values from the grid.
+    values = [digits] * 81
+    for s, d in enumerate(grid_values(grid)):
+        if d in digits and not assign(values, s, d, max_subset):
+            return False  ## (Fail if we can't assign d to square s.)
+    return values
+
+
+def grid_values(grid):
+    "Convert grid into a list of 81 chars with '0' or '.' for empties."
+    chars = [c for c in grid if c in digits or c in '0.']
+    assert len(chars) == 81
+    return chars
+
+
+################ Constraint Propagation ################
+
+def assign(values, s, d, max_subset=MAX_SUBSET):
+    """Eliminate all the other values (except d) from values[s] and propagate.
+    Return values, except return False if a contradiction is detected."""
+    other_values = values[s].replace(d, '')
+    if all(eliminate_naked_pairs(values, s, d2, max_subset) for d2 in other_values):
+        return values
+    else:
+        return False
+
+
+def eliminate_naked_pairs(values, s, d, max_subset=MAX_SUBSET):
+    """Eliminate d from values[s]; propagate when values or places <= 2, or
+    n squares of a unit share n <= max_subset values.
+    Return values, except return False if a contradiction is detected."""
+    if d not in values[s]:
+        return values  ## Already eliminated
+    values[s] = values[s].replace(d, '')
+    ## (1) If a square s is reduced to one value d2, then eliminate d2 from the peers.
+    if len(values[s]) == 0:
+        return False  ## Contradiction: removed last value
+    elif len(values[s]) == 1:
+        d2 = values[s]
+        if not all(eliminate_naked_pairs(values, s2, d2, max_subset) for s2 in peers[s]):
+            return False
+    ## (2) If a unit u is reduced to only one place for a value d, then put it there.
+    for u in units[s]:
+        dplaces = [s for s in u if d in values[s]]
+        if len(dplaces) == 0:
+            return False  ## Contradiction: no place for this value
+        elif len(dplaces) == 1:
+            # d can only be in one place in unit; assign it there
+            if not assign(values, dplaces[0], d, max_subset):
+                return False
+    ## (3) If n squares of a unit u have only n values between them, then no
+    ## other square of u can have those values. Only s changed, so only a set
+    ## that includes s can be new, and only in the units of s.
+    if 1 < len(values[s]) <= max_subset:
+        for u in units[s]:
+            subset = naked_subset(values, s, u, max_subset)
+            if subset:
+                ds, places = subset
+                if len(ds) < len(places):
+                    return False  ## Contradiction: more squares than values for them
+                for s2 in u:
+                    if s2 not in places and not all(eliminate_naked_pairs(values, s2, d2, max_subset)
+                                                    for d2 in ds if d2 in values[s2]):
+                        return False
+    return values
+
+
+def naked_subset_rule(values, s, max_subset=MAX_SUBSET):
+    """Rule (3) as a rule for trail.propagate: the (s2, d2) eliminations that
+    the naked subsets with s in them call for, or False on a contradiction."""
+    found = []
+    if 1 < len(values[s]) <= max_subset:
+        for u in units[s]:
+            subset = naked_subset(values, s, u, max_subset)
+            if subset:
+                ds, places = subset
+                if len(ds) < len(places):
+                    return False  ## Contradiction: more squares than values for them
+                found.extend((s2, d2) for s2 in u if s2 not in places for d2 in ds if d2 in values[s2])
+    return found
+
+
+def naked_subset(values, s, u, max_subset=MAX_SUBSET):
+    """Find n squares of unit u, s among them, whose values together are only
+    n digits (or fewer, a contradiction). Return (those digits, those
+    squares), or None if there are none."""
+    others = [s2 for s2 in u if s2 != s and 1 < len(values[s2]) <= max_subset]
+
+    def extend(ds, places, start):
+        if len(ds) <= len(places):
+            return ds, places
+        for i in range(start, len(others)):
+            union = ds | set(values[others[i]])
+            if len(union) <= max_subset:
+                found = extend(union, places + [others[i]], i + 1)
+                if found:
+                    return found
+        return None
+
+    return extend(set(values[s]), [s], 0)
+
+
+################ Display as 2-D grid ################
+
+def display(values):
+    "Display these values as a 2-D grid."
+    width = 1 + max(len(v) for v in values)
+    line = '+'.join(['-' * (width * 3)] * 3)
+    for r in rows:
+        print(''.join(values[index[r + c]].center(width) + ('|' if c in '36' else ''))
+              for c in cols)
+        if r in 'CF': print(line)
+
+
+################ Search ################
+def solve_naked_pairs(grid, max_subset=MAX_SUBSET):
+    return search_naked_pairs(parse_grid(grid, max_subset), max_subset)
+
+
+## Same search without values.copy(): see trail.py. Its queue-based propagate
+## runs rule (3) through naked_subset_rule. Pass stats=trail.new_stats() to
+## count the copies it avoided.
+def solve_naked_pairs_trail(grid, stats=None, max_subset=MAX_SUBSET):
+    return trail.search(parse_grid(grid, max_subset), trail.mrv, stats,
+                        functools.partial(naked_subset_rule, max_subset=max_subset))
+
+
+def search_naked_pairs(values, max_subset=MAX_SUBSET):
+    "Using depth-first search and propagation, try all possible values."
+    if values is False:
+        return False  ## Failed earlier
+    if all(len(v) == 1 for v in values):
+        return values  ## Solved!
+    ## Chose the unfilled square s with the fewest possibilities
+    n, s = min((len(v), s) for s, v in enumerate(values) if len(v) > 1)
+    return some(search_naked_pairs(assign(values.copy(), s, d, max_subset), max_subset)
+                for d in values[s])
+
+
+################ Utilities ################
+
+def some(seq):
+    "Return some element of seq that is true."
+    for e in seq:
+        if e: return e
+    return False
+
+
+def from_file(filename, sep='\n'):
+    "Parse a file into a list of strings, separated by sep."
+    return open(filename).read().strip().split(sep)
+
+
+def shuffled(seq):
+    "Return a randomly shuffled copy of the input sequence."
+    seq = list(seq)
+    random.shuffle(seq)
+    return seq
+
+
+def solve(grid): return search_naked_pairs(parse_grid(grid))
+
+
+################ System test ################
+
+import random
+import time
+
+from . import batch
+from . import stream
+
+
+def solve_all(grids, name='', showif=0.0, processes=1):
+    """Attempt to solve a sequence of grids. Report results.
+    When showif is a number of seconds, display puzzles that take longer.
+    When showif is None, don't display any puzzles.
+    When processes is not 1, solve the grids in chunks on that many worker
+    processes (None for one per core); the report covers them all in order.
+    grids can be any iterable, e.g. stream.read_grids(filename): each grid
+    is solved as it is read, and only running totals are kept."""
+    totals = stream.new_totals()
+    start = time.perf_counter()
+    for grid, t, values in batch.solve_stream(solve_naked_pairs, grids, processes):
+        ## Display puzzles that take long enough
+        if showif is not None and t > showif:
+            display(grid_values(grid))
+            if values: display(values)
+            print('(%.2f seconds)\n' % t)
+        stream.add(totals, t, solved(values), grid)
+    wall = time.perf_counter() - start if processes != 1 else None
+    if totals['N'] > 1:
+        print(stream.summary(totals, name, wall))
+        print(stream.latency(totals))
+
+
+def solved(values):
+    "A puzzle is solved if each unit is a permutation of the digits 1 to 9."
+
+    def unitsolved(unit): return set(values[s] for s in unit) == set(digits)
+
+    return values is not False and all(unitsolved(unit) for unit in unitlist)
+
+
+def random_puzzle(N=17):
+    """Make a random puzzle with N or more assignments. Restart on contradictions.
+    Note the resulting puzzle is not guaranteed to be solvable, but empirically
+    about 99.8% of them are solvable. Some have multiple solutions."""
+    values = [digits] * 81
+    for s in shuffled(range(81)):
+        if not assign(values, s, random.choice(values[s])):
+            break
+        ds = [v for v in values if len(v) == 1]
+        if len(ds) >= N and len(set(ds)) >= 8:
+            return ''.join(v if len(v) == 1 else '.' for v in values)
+    return random_puzzle(N)  ## Give up and make a new puzzle
+
+
+grid1 = '003020600900305001001806400008102900700000008006708200002609500800203009005010300'
+grid2 = '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......'
+hard1 = '.....6....59.....82....8....45........3........6..3.54...325..6..................'
+
+if __name__ == '__main__':
+    test()
+    solve_all(from_file("top95.txt"), "95sudoku", None)
+    # solve_all(from_file("easy50.txt", '========'), "easy", None)
+    solve_all(from_file("100sudoku.txt"), "hard", None)
+    solve_all(from_file("1000sudoku.txt"), "hard", None)
+    # solve_all(from_file("hardest.txt"), "hardest", None)
+    solve_all([random_puzzle() for _ in range(99)], "random", 100.0)
+
+## References used:
+## http://www.scanraid.com/BasicStrategies.htm
+## http://www.sudokudragon.com/sudokustrategy.htm
+## http://www.krazydad.com/blog/2005/09/29/an-index-of-sudoku-strategies/
+## http://www2.warwick.ac.uk/fac/sci/moac/currentstudents/peter_cock/python/sudoku/
@@ -8,30 +8,16 @@ from itertools import islice
 ## Throughout this program we have:
 ##   r is a row,    e.g. 'A'
 ##   c is a column, e.g. '3'
-##   s is a square, e.g. 'A3'
+##   s is a square, e.g. 2 for 'A3' (see topology.py)
 ##   d is a digit,  e.g. '9'
-##   u is a unit,   e.g. ['A1','B1','C1','D1','E1','F1','G1','H1','I1']
+##   u is a unit,   e.g. (0, 9, 18, 27, 36, 45, 54, 63, 72) for 'A1'..'I1'
 ##   grid is a grid,e.g. 81 non-blank chars, e.g. starting with '.18...7...
-##   values is a dict of possible values, e.g. {'A1':'12349', 'A2':'8', ...}
+##   values is a list of possible values, e.g. ['12349', '8', ...]
 import numpy as np
 
 
-def cross(A, B):
-    "Cross product of elements in A and elements in B."
-    return [a + b for a in A for b in B]
-
-
-digits = '123456789'
-rows = 'ABCDEFGHI'
-cols = digits
-squares = cross(rows, cols)
-unitlist = ([cross(rows, c) for c in cols] +
-            [cross(r, cols) for r in rows] +
-            [cross(rs, cs) for rs in ('ABC', 'DEF', 'GHI') for cs in ('123', '456', '789')])
-units = dict((s, [u for u in unitlist if s in u])
-             for s in squares)
-peers = dict((s, set(sum(units[s], [])) - set([s]))
-             for s in squares)
+from .topology import (digits, rows, cols, squares, index, unitlist, units, peers,
+                      row_units, col_units, box_units)
 
 
 ################ Unit Tests ################
@@ -40,35 +26,37 @@ def test():
     "A set of tests that must pass."
     assert len(squares) == 81
     assert len(unitlist) == 27
-    assert all(len(units[s]) == 3 for s in squares)
-    assert all(len(peers[s]) == 20 for s in squares)
-    assert units['C2'] == [['A2', 'B2', 'C2', 'D2', 'E2', 'F2', 'G2', 'H2', 'I2'],
-                           ['C1', 'C2', 'C3', 'C4', 'C5', 'C6', 'C7', 'C8', 'C9'],
-                           ['A1', 'A2', 'A3', 'B1', 'B2', 'B3', 'C1', 'C2', 'C3']]
-    assert peers['C2'] == set(['A2', 'B2', 'D2', 'E2', 'F2', 'G2', 'H2', 'I2',
-                               'C1', 'C3', 'C4', 'C5', 'C6', 'C7', 'C8', 'C9',
-                               'A1', 'A3', 'B1', 'B3'])
+    assert all(len(units[s]) == 3 for s in range(81))
+    assert all(len(peers[s]) == 20 for s in range(81))
+    assert [[squares[s] for s in u] for u in units[index['C2']]] == \
+           [['A2', 'B2', 'C2', 'D2', 'E2', 'F2', 'G2', 'H2', 'I2'],
+            ['C1', 'C2', 'C3', 'C4', 'C5', 'C6', 'C7', 'C8', 'C9'],
+            ['A1', 'A2', 'A3', 'B1', 'B2', 'B3', 'C1', 'C2', 'C3']]
+    assert set(squares[s] for s in peers[index['C2']]) == \
+           set(['A2', 'B2', 'D2', 'E2', 'F2', 'G2', 'H2', 'I2',
+                'C1', 'C3', 'C4', 'C5', 'C6', 'C7', 'C8', 'C9',
+                'A1', 'A3', 'B1', 'B3'])
     print('All tests pass.')
 
 
 ################ Parse a Grid ################
 
 def parse_grid(grid):
-    """Convert grid to a dict of possible values, {square: digits}, or
+    """Convert grid to a list of possible values, [digits, ...], or
     return False if a contradiction is detected."""
     ## To start, every square can be any digit; then assign values from the grid.
-    values = dict((s, digits) for s in squares)
-    for s, d in grid_values(grid).items():
+    values = [digits] * 81
+    for s, d in enumerate(grid_values(grid)):
         if d in digits and not assign(values, s, d):
             return False  ## (Fail if we can't assign d to square s.)
     return values
 
 
 def grid_values(grid):
-    "Convert grid into a dict of {square: char} with '0' or '.' for empties."
+    "Convert grid into a list of 81 chars with '0' or '.' for empties."
     chars = [c for c in grid if c in digits or c in '0.']
     assert len(chars) == 81
-    return dict(zip(squares, chars))
+    return chars
 
 
 ################ Constraint Propagation ################
@@ -112,10 +100,10 @@ def eliminate(values, s, d):
 
 def display(values):
     "Display these values as a 2-D grid."
-    width = 1 + max(len(values[s]) for s in squares)
+    width = 1 + max(len(v) for v in values)
     line = '+'.join(['-' * (width * 3)] * 3)
     for r in rows:
-        print(''.join(values[r + c].center(width) + ('|' if c in '36' else ''))
+        print(''.join(values[index[r + c]].center(width) + ('|' if c in '36' else ''))
               for c in cols)
         if r in 'CF': print(line)
 
@@ -128,23 +116,16 @@ def solve(grid): return search(parse_grid(grid))
 # returns values associated to key
 def returnValues(values):
     lst = []
-    for (key, value) in values.items():
+    for (key, value) in enumerate(values):
         lst.append(value)
         return lst
 
 
 # returns a dictionary of all 9 squares with keys and values
 def nine_squares(values):
-    lst = [3, 6, 9]
     squares_dict = dict()
-    list_squares = []
 
-    for i in lst:
-        list_squares.append((units['A' + str(i)][2]))
-        list_squares.append((units['D' + str(i)][2]))
-        list_squares.append((units['G' + str(i)][2]))
-
-    for i in list_squares:
+    for i in box_units:
         for j in i:
             squares_dict.update({j: values[j]})
     return squares_dict
@@ -162,19 +143,19 @@ def fill(values):
 def fill_square(square_dict, square_dict_final):
     lst_digit = ['1', '2', '3', '4', '5', '6', '7', '8', '9']
     lst_already_popped = []
-    for index, key in enumerate(square_dict):
-        if index < 9:
+    for position, key in enumerate(square_dict):
+        if position < 9:
             square_dict_final[key] = square_dict.get(key)
             lst_already_popped.append(key)
             if square_dict.get(key) in lst_digit:
                 lst_digit.remove(square_dict.get(key))
-        if index == 9:
+        if position == 9:
             break
 
     for key in lst_already_popped:
         square_dict.pop(key)
 
-    for index, key in enumerate(square_dict_final):
+    for key in square_dict_final:
         if square_dict_final[key] == '.':
             x = random.choice(lst_digit)
             square_dict_final.update({key: str(x)})
@@ -183,7 +164,7 @@ def fill_square(square_dict, square_dict_final):
 
 #updates all values in original dictionary
 def update_values(square_dict_final, values):
-    for key in values:
+    for key in range(len(values)):
         if key in square_dict_final:
             values[key] = square_dict_final[key]
     return values
@@ -191,7 +172,7 @@ def update_values(square_dict_final, values):
 #returns conflicts in columns
 def columns_conflicts(values):
     conflicts = 0
-    for column in [cross(rows, c) for c in cols]:
+    for column in col_units:
         list_columns = []
         for i in column:
             list_columns.append(values[i])
@@ -211,7 +192,7 @@ def columns_conflicts(values):
 #returns number of conflicts in rows
 def row_conflicts(values):
     conflicts = 0
-    for row in [cross(r, cols) for r in rows]:  ## For rows
+    for row in row_units:  ## For rows
         list_rows = []
 
         for s in row:
@@ -242,7 +223,7 @@ def hill_climbing(values, grid):
     nouv_values = None
     list_key_with_valeur = list_only_keys_with_numbers(grid)
     #returns all keys that already have a value in the original grid
-    for s in squares:
+    for s in range(81):
         if s not in list_key_with_valeur: #do not take the keys that already have values
             succ = current.copy()
             l = list_squares(fill(values))[s]
@@ -265,7 +246,7 @@ def hill_climbing(values, grid):
 def list_only_keys_with_numbers(grid):
     values_original = grid_values(grid)
     lst = []
-    for i in values_original:
+    for i in range(len(values_original)):
         if not (values_original[i] == '.'):
             lst.append(i)
     return lst
@@ -293,10 +274,10 @@ def search(values):
     "Using depth-first search and propagation, try all possible values."
     if values is False:
         return False  ## Failed earlier
-    if all(len(values[s]) == 1 for s in squares):
+    if all(len(v) == 1 for v in values):
         return values  ## Solved!
     ## Chose the unfilled square s with the fewest possibilities
-    n, s = min((len(values[s]), s) for s in squares if len(values[s]) > 1)
+    n, s = min((len(v), s) for s, v in enumerate(values) if len(v) > 1)
     return some(search(assign(values.copy(), s, d))
                 for d in values[s])
 
@@ -326,28 +307,31 @@ def shuffled(seq):
 
 import time, random
 
+from . import batch
+from . import stream
 
-def solve_all(grids, name='', showif=0.0):
+
+def solve_all(grids, name='', showif=0.0, processes=1):
     """Attempt to solve a sequence of grids. Report results.
     When showif is a number of seconds, display puzzles that take longer.
-    When showif is None, don't display any puzzles."""
-
-    def time_solve(grid):
-        start = time.perf_counter()
-        values = solve_hillClimbing(grid) #call the function
-        t = time.perf_counter() - start
+    When showif is None, don't display any puzzles.
+    When processes is not 1, solve the grids in chunks on that many worker
+    processes (None for one per core); the report covers them all in order.
+    grids can be any iterable, e.g. stream.read_grids(filename): each grid
+    is solved as it is read, and only running totals are kept."""
+    totals = stream.new_totals()
+    start = time.perf_counter()
+    for grid, t, values in batch.solve_stream(solve_hillClimbing, grids, processes):
         ## Display puzzles that take long enough
         if showif is not None and t > showif:
             display(grid_values(grid))
             if values: display(values)
             print('(%.2f seconds)\n' % t)
-        return (t, solved(values))
-
-    times, results = zip(*[time_solve(grid) for grid in grids])
-    N = len(grids)
-    if N > 1:
-        print("Solved %d of %d %s puzzles (avg %.2f secs (%d Hz), max %.2f secs)." % (
-            sum(results), N, name, sum(times) / N, N / sum(times), max(times)))
+        stream.add(totals, t, solved(values), grid)
+    wall = time.perf_counter() - start if processes != 1 else None
+    if totals['N'] > 1:
+        print(stream.summary(totals, name, wall))
+        print(stream.latency(totals))
 
 
 def solved(values):
@@ -362,13 +346,13 @@ def random_puzzle(N=17):
     """Make a random puzzle with N or more assignments. Restart on contradictions.
     Note the resulting puzzle is not guaranteed to be solvable, but empirically
     about 99.8% of them are solvable. Some have multiple solutions."""
-    values = dict((s, digits) for s in squares)
-    for s in shuffled(squares):
+    values = [digits] * 81
+    for s in shuffled(range(81)):
         if not assign(values, s, random.choice(values[s])):
             break
-        ds = [values[s] for s in squares if len(values[s]) == 1]
+        ds = [v for v in values if len(v) == 1]
         if len(ds) >= N and len(set(ds)) >= 8:
-            return ''.join(values[s] if len(values[s]) == 1 else '.' for s in squares)
+            return ''.join(v if len(v) == 1 else '.' for v in values)
     return random_puzzle(N)  ## Give up and make a new puzzle
 
 
@@ -378,14 +362,14 @@ hard1 = '.....6....59.....82....8....45........3........6..3.54...325..6........
 
 if __name__ == '__main__':
     test()
-# solve_all(from_file("grid2.txt"), "grid2", None)
-solve_all(from_file("top95.txt"), "95sudoku", None)
-# solve_all(from_file("easy50.txt", '========'), "easy", None)
-# solve_all(from_file("easy50.txt", '========'), "easy", None)
-# solve_all(from_file("100sudoku.txt"), "hard", None)
-# solve_all(from_file("1000sudoku.txt"), "hard", None)
-# solve_all(from_file("hardest.txt"), "hardest", None)
-# solve_all([random_puzzle() for _ in range(99)], "random", 100.0)
+    # solve_all(from_file("grid2.txt"), "grid2", None)
+    solve_all(from_file("top95.txt"), "95sudoku", None)
+    # solve_all(from_file("easy50.txt", '========'), "easy", None)
+    # solve_all(from_file("easy50.txt", '========'), "easy", None)
+    # solve_all(from_file("100sudoku.txt"), "hard", None)
+    # solve_all(from_file("1000sudoku.txt"), "hard", None)
+    # solve_all(from_file("hardest.txt"), "hardest", None)
+    # solve_all([random_puzzle() for _ in range(99)], "random", 100.0)
 
 
 
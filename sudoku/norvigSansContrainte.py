@@ -5,28 +5,15 @@
 ## Throughout this program we have:
 ##   r is a row,    e.g. 'A'
 ##   c is a column, e.g. '3'
-##   s is a square, e.g. 'A3'
+##   s is a square, e.g. 2 for 'A3' (see topology.py)
 ##   d is a digit,  e.g. '9'
-##   u is a unit,   e.g. ['A1','B1','C1','D1','E1','F1','G1','H1','I1']
+##   u is a unit,   e.g. (0, 9, 18, 27, 36, 45, 54, 63, 72) for 'A1'..'I1'
 ##   grid is a grid,e.g. 81 non-blank chars, e.g. starting with '.18...7...
-##   values is a dict of possible values, e.g. {'A1':'12349', 'A2':'8', ...}
+##   values is a list of possible values, e.g. ['12349', '8', ...]
 
-def cross(A, B):
-    "Cross product of elements in A and elements in B."
-    return [a + b for a in A for b in B]
-
-
-digits = '123456789'
-rows = 'ABCDEFGHI'
-cols = digits
-squares = cross(rows, cols)
-unitlist = ([cross(rows, c) for c in cols] +
-            [cross(r, cols) for r in rows] +
-            [cross(rs, cs) for rs in ('ABC', 'DEF', 'GHI') for cs in ('123', '456', '789')])
-units = dict((s, [u for u in unitlist if s in u])
-             for s in squares)
-peers = dict((s, set(sum(units[s], [])) - set([s]))
-             for s in squares)
+from .topology import digits, rows, cols, squares, index, unitlist, units, peers
+from . import batch
+from . import trail
 
 
 ################ Unit Tests ################
@@ -35,35 +22,39 @@ def test():
     "A set of tests that must pass."
     assert len(squares) == 81
     assert len(unitlist) == 27
-    assert all(len(units[s]) == 3 for s in squares)
-    assert all(len(peers[s]) == 20 for s in squares)
-    assert units['C2'] == [['A2', 'B2', 'C2', 'D2', 'E2', 'F2', 'G2', 'H2', 'I2'],
-                           ['C1', 'C2', 'C3', 'C4', 'C5', 'C6', 'C7', 'C8', 'C9'],
-                           ['A1', 'A2', 'A3', 'B1', 'B2', 'B3', 'C1', 'C2', 'C3']]
-    assert peers['C2'] == set(['A2', 'B2', 'D2', 'E2', 'F2', 'G2', 'H2', 'I2',
-                               'C1', 'C3', 'C4', 'C5', 'C6', 'C7', 'C8', 'C9',
-                               'A1', 'A3', 'B1', 'B3'])
+    assert all(len(units[s]) == 3 for s in range(81))
+    assert all(len(peers[s]) == 20 for s in range(81))
+    assert [[squares[s] for s in u] for u in units[index['C2']]] == \
+           [['A2', 'B2', 'C2', 'D2', 'E2', 'F2', 'G2', 'H2', 'I2'],
+            ['C1', 'C2', 'C3', 'C4', 'C5', 'C6', 'C7', 'C8', 'C9'],
+            ['A1', 'A2', 'A3', 'B1', 'B2', 'B3', 'C1', 'C2', 'C3']]
+    assert set(squares[s] for s in peers[index['C2']]) == \
+           set(['A2', 'B2', 'D2', 'E2', 'F2', 'G2', 'H2', 'I2',
+                'C1', 'C3', 'C4', 'C5', 'C6', 'C7', 'C8', 'C9',
+                'A1', 'A3', 'B1', 'B3'])
+    assert solve(hard1, max_nodes=3) is batch.TIMED_OUT and not solved(batch.TIMED_OUT)
+    assert solved(solve(grid2, max_nodes=10 ** 6, max_time=60.0))
     print('All tests pass.')
 
 
 ################ Parse a Grid ################
 
 def parse_grid(grid):
-    """Convert grid to a dict of possible values, {square: digits}, or
+    """Convert grid to a list of possible values, [digits, ...], or
     return False if a contradiction is detected."""
     ## To start, every square can be any digit; then assign values from the grid.
-    values = dict((s, digits) for s in squares)
-    for s, d in grid_values(grid).items():
+    values = [digits] * 81
+    for s, d in enumerate(grid_values(grid)):
         if d in digits and not assign(values, s, d):
             return False  ## (Fail if we can't assign d to square s.)
     return values
 
 
 def grid_values(grid):
-    "Convert grid into a dict of {square: char} with '0' or '.' for empties."
+    "Convert grid into a list of 81 chars with '0' or '.' for empties."
     chars = [c for c in grid if c in digits or c in '0.']
     assert len(chars) == 81
-    return dict(zip(squares, chars))
+    return chars
 
 
 ################ Constraint Propagation ################
@@ -107,37 +98,51 @@ def eliminate(values, s, d):
 
 def display(values):
     "Display these values as a 2-D grid."
-    width = 1 + max(len(values[s]) for s in squares)
+    width = 1 + max(len(v) for v in values)
     line = '+'.join(['-' * (width * 3)] * 3)
     for r in rows:
-        print(''.join(values[r + c].center(width) + ('|' if c in '36' else ''))
+        print(''.join(values[index[r + c]].center(width) + ('|' if c in '36' else ''))
               for c in cols)
         if r in 'CF': print(line)
 
 
 ################ Search ################
 
-def solve(grid): return search(parse_grid(grid))
+def solve(grid, max_nodes=None, max_time=None):
+    """Solve grid; return values or False. Given max_nodes search nodes or
+    max_time seconds, give up when they are used up and return batch.TIMED_OUT."""
+    budget = batch.new_budget(max_nodes, max_time)
+    try:
+        return search(parse_grid(grid), budget)
+    except batch.OutOfBudget:
+        return batch.TIMED_OUT
+
+
+## Same search without values.copy(): see trail.py. Pass stats=trail.new_stats()
+## to count the copies it avoided.
+def solve_trail(grid, stats=None): return trail.search(parse_grid(grid), trail.first_unfilled, stats)
 
 def creation_new_values (values):
     new_values = dict()
-    for (key ,value) in values.items():
+    for (key ,value) in enumerate(values):
         if (len(value)>1):
             new_values[key]= value
     return new_values
 
 
 
-def search(values):
-    "Using depth-first search and propagation, try all possible values."
+def search(values, budget=None):
+    "Using depth-first search and propagation, try all possible values (spending budget, if any)."
     if values is False:
         return False  ## Failed earlier
-    if all(len(values[s]) == 1 for s in squares):
+    if budget is not None:
+        batch.spend(budget)
+    if all(len(v) == 1 for v in values):
         return values  ## Solved!
     ## Chose the unfilled square s with the fewest possibilities
-    # n, s = min((len(values[s]), s) for s in squares if len(values[s]) > 1)
+    # n, s = min((len(v), s) for s, v in enumerate(values) if len(v) > 1)
     for(key,value) in creation_new_values(values).items():
-        return some(search(assign(values.copy(), key, value))
+        return some(search(assign(values.copy(), key, value), budget)
                 for value in values[key])
 
 
@@ -164,30 +169,36 @@ def shuffled(seq):
 
 ################ System test ################
 
+import functools
 import time, random
 
+from . import stream
 
-def solve_all(grids, name='', showif=0.0):
+
+def solve_all(grids, name='', showif=0.0, processes=1, max_nodes=None, max_time=None):
     """Attempt to solve a sequence of grids. Report results.
     When showif is a number of seconds, display puzzles that take longer.
-    When showif is None, don't display any puzzles."""
-
-    def time_solve(grid):
-        start = time.perf_counter()
-        values = solve(grid)
-        t = time.perf_counter() - start
+    When showif is None, don't display any puzzles.
+    When processes is not 1, solve the grids in chunks on that many worker
+    processes (None for one per core); the report covers them all in order.
+    grids can be any iterable, e.g. stream.read_grids(filename): each grid
+    is solved as it is read, and only running totals are kept.
+    With max_nodes or max_time, each puzzle gets that budget (see solve);
+    the puzzles that use it up are reported as timed out, not unsolved."""
+    solver = functools.partial(solve, max_nodes=max_nodes, max_time=max_time)
+    totals = stream.new_totals()
+    start = time.perf_counter()
+    for grid, t, values in batch.solve_stream(solver, grids, processes):
         ## Display puzzles that take long enough
         if showif is not None and t > showif:
             display(grid_values(grid))
             if values: display(values)
             print('(%.2f seconds)\n' % t)
-        return (t, solved(values))
-
-    times, results = zip(*[time_solve(grid) for grid in grids])
-    N = len(grids)
-    if N > 1:
-        print("Solved %d of %d %s puzzles (avg %.2f secs (%d Hz), max %.2f secs)." % (
-            sum(results), N, name, sum(times) / N, N / sum(times), max(times)))
+        stream.add(totals, t, solved(values), grid, values is batch.TIMED_OUT)
+    wall = time.perf_counter() - start if processes != 1 else None
+    if totals['N'] > 1:
+        print(stream.summary(totals, name, wall))
+        print(stream.latency(totals))
 
 
 def solved(values):
@@ -195,20 +206,20 @@ def solved(values):
 
     def unitsolved(unit): return set(values[s] for s in unit) == set(digits)
 
-    return values is not False and all(unitsolved(unit) for unit in unitlist)
+    return bool(values) and all(unitsolved(unit) for unit in unitlist)
 
 
 def random_puzzle(N=17):
     """Make a random puzzle with N or more assignments. Restart on contradictions.
     Note the resulting puzzle is not guaranteed to be solvable, but empirically
     about 99.8% of them are solvable. Some have multiple solutions."""
-    values = dict((s, digits) for s in squares)
-    for s in shuffled(squares):
+    values = [digits] * 81
+    for s in shuffled(range(81)):
         if not assign(values, s, random.choice(values[s])):
             break
-        ds = [values[s] for s in squares if len(values[s]) == 1]
+        ds = [v for v in values if len(v) == 1]
         if len(ds) >= N and len(set(ds)) >= 8:
-            return ''.join(values[s] if len(values[s]) == 1 else '.' for s in squares)
+            return ''.join(v if len(v) == 1 else '.' for v in values)
     return random_puzzle(N)  ## Give up and make a new puzzle
 
 
@@ -218,13 +229,13 @@ hard1 = '.....6....59.....82....8....45........3........6..3.54...325..6........
 
 if __name__ == '__main__':
     test()
-solve_all(from_file("top95.txt"), "95sudoku", None)
-# solve_all(from_file("easy50.txt", '========'), "easy", None)
-# solve_all(from_file("easy50.txt", '========'), "easy", None)
-solve_all(from_file("100sudoku.txt"), "hard", None)
-solve_all(from_file("1000sudoku.txt"), "hard", None)
-# solve_all(from_file("hardest.txt"), "hardest", None)
-# solve_all([random_puzzle() for _ in range(99)], "random", 100.0)
+    solve_all(from_file("top95.txt"), "95sudoku", None)
+    # solve_all(from_file("easy50.txt", '========'), "easy", None)
+    # solve_all(from_file("easy50.txt", '========'), "easy", None)
+    solve_all(from_file("100sudoku.txt"), "hard", None)
+    solve_all(from_file("1000sudoku.txt"), "hard", None)
+    # solve_all(from_file("hardest.txt"), "hardest", None)
+    # solve_all([random_puzzle() for _ in range(99)], "random", 100.0, max_time=10.0)
 
 ## References used:
 ## http://www.scanraid.com/BasicStrategies.htm
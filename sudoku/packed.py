@@ -0,0 +1,113 @@
+## Store puzzle corpora packed at 4 bits per square, and read them in place
+
+## A text corpus spends 82 bytes (81 chars and a newline) on each puzzle, and
+## every solve starts by filtering those chars one by one. Here a puzzle is
+## 41 bytes: square s is the high nibble of byte s // 2 when s is even and the
+## low nibble when s is odd, holding the digit 1..9, or 0 for an empty square
+## (the last byte's low nibble is always 0). The file is just the puzzles one
+## after another, so puzzle i starts at byte 41 * i and a memory map of the
+## file gives any puzzle without reading the ones before it.
+## Unpacking is bytes.hex(): each nibble is already the digit's own hex char,
+## and '0' is an empty square to every parse_grid, so the string goes
+## straight into any of the solvers.
+
+## Throughout this program we have:
+##   grid is a grid as in norvig.py, e.g. 81 non-blank chars starting with '4.....8.5'
+##   data is the 41 packed bytes of one puzzle
+##   corpus is a memory map (or any bytes-like object) of packed puzzles
+
+import mmap
+import os
+
+from .topology import digits
+
+SIZE = 41  ## Bytes per packed puzzle
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    data = pack(grid2)
+    assert len(data) == SIZE and data[0] == 0x40 and data[-1] == 0
+    assert unpack(data) == grid2.replace('.', '0')
+    import tempfile
+    from . import stream
+    path = os.path.join(tempfile.mkdtemp(), 'top95.bin')
+    assert pack_file("top95.txt", path) == 95 and os.path.getsize(path) == 95 * SIZE
+    grids = [grid.replace('.', '0') for grid in stream.read_grids("top95.txt")]
+    with open_corpus(path) as corpus:
+        assert count(corpus) == 95
+        assert grid_at(corpus, 94) == grids[94] and grid_at(corpus, -1) == grids[94]
+    assert list(read_grids(path)) == grids
+    open(path, 'wb').close()
+    assert list(read_grids(path)) == []
+    print('All tests pass.')
+
+
+################ Packing ################
+
+def pack(grid):
+    "Pack grid into its 41 bytes."
+    chars = [c for c in grid if c in digits or c in '0.']
+    assert len(chars) == 81
+    text = ''.join(c if c in digits else '0' for c in chars) + '0'
+    return bytes.fromhex(text)
+
+
+def unpack(data):
+    "The 81-char grid of 41 packed bytes, with '0' for empties."
+    return data.hex()[:81]
+
+
+def pack_file(textfile, binfile, sep='\n'):
+    "Convert a text corpus into a packed one, a puzzle at a time. Return the number of puzzles."
+    from . import stream
+    n = 0
+    with open(binfile, 'wb') as out:
+        for grid in stream.read_grids(textfile, sep):
+            out.write(pack(grid))
+            n += 1
+    return n
+
+
+################ Reading ################
+
+def open_corpus(filename):
+    """Memory-map a packed corpus for reading; use it in a with statement to
+    close it. An empty file, which mmap refuses, is an empty corpus."""
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b'')
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def count(corpus):
+    "The number of puzzles in a packed corpus."
+    return len(corpus) // SIZE
+
+
+def grid_at(corpus, i):
+    "Puzzle i of a packed corpus (negative i counts from the end), as a grid."
+    if i < 0:
+        i += count(corpus)
+    if not 0 <= i < count(corpus):
+        raise IndexError('puzzle %d out of range' % i)
+    return unpack(corpus[SIZE * i:SIZE * (i + 1)])
+
+
+def read_grids(filename):
+    "Yield the puzzles of a packed corpus one by one, like stream.read_grids."
+    with open_corpus(filename) as corpus:
+        for i in range(count(corpus)):
+            yield unpack(corpus[SIZE * i:SIZE * (i + 1)])
+
+
+grid2 = '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......'
+
+if __name__ == '__main__':
+    test()
+    import sys
+    for textfile in sys.argv[1:]:
+        binfile = textfile.rsplit('.', 1)[0] + '.bin'
+        print('%s: %d puzzles packed into %s' % (textfile, pack_file(textfile, binfile), binfile))
@@ -0,0 +1,198 @@
+## Rate puzzles by what it takes to solve them, and pick a solver by the rating
+
+## A time says as much about the machine as about the puzzle. A rating here
+## is made of counts, so it is the same on any machine and on every run:
+##   rule     the hardest technique the puzzle needs: 'singles' if naked and
+##            hidden singles solve it, else the costliest rule of rules.py
+##            that the scheduler (cheapest first) had to use, or 'search'
+##            if all the rules together still leave squares open
+##   nodes    the size of the search tree that singles and depth-first
+##            search (as in norvigBitmask.py) go through to the solution
+##   backtracks  the nodes of that tree abandoned when every guess below
+##            them failed, each counted once (as norvig.new_counts does)
+## and a grade from the rule: easy, medium, hard or fiendish.
+## calibrate times a few solvers on a sample of rated puzzles, once, and
+## fits each solver's seconds as a + b * nodes, and its solve rate for each
+## rule; predict turns a rating into an expected cost per solver (the time
+## over the chance of solving), and choose picks the cheapest.
+
+## Throughout this program we have:
+##   values is a list of 81 masks, as in norvigBitmask.py
+##   rating is a dict: {'rule', 'level', 'grade', 'nodes', 'backtracks', 'clues'}
+##   name is a solver's name, a subcommand of cli.py, e.g. 'dlx'
+##   model maps a solver's name to {'a', 'b', 'rate'}, where rate maps a
+##   rule to the solver's solve rate on puzzles that need it
+
+import time
+
+from .topology import digits
+from . import batch
+from . import norvigBitmask
+from . import rules
+from .norvigBitmask import popcount
+
+LEVELS = ['singles'] + rules.by_cost(rules.RULES) + ['search']
+GRADES = {'singles': 'easy', 'naked_pairs': 'medium', 'pointing_pairs': 'medium', 'box_line': 'medium',
+          'hidden_pairs': 'hard', 'x_wing': 'hard', 'search': 'fiendish'}
+CANDIDATES = ['bitmask', 'rules', 'dlx', 'hillclimbing']  ## The solvers choose picks from
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    assert set(GRADES) == set(LEVELS)
+    easy = rate(grid1)
+    assert (easy['rule'], easy['grade'], easy['nodes'], easy['backtracks']) == ('singles', 'easy', 1, 0)
+    hard = rate(hard1)
+    assert hard['rule'] == 'search' and hard['level'] == len(LEVELS) - 1 and hard['nodes'] > 1
+    assert 0 < hard['backtracks'] < hard['nodes']
+    assert rate(grid2) == rate(grid2) and rate('11' + '.' * 79)['rule'] == 'invalid'
+    grids = from_file("top95.txt")[:20]
+    ratings = [rating for grid, rating in rate_all(grids)]
+    assert [rating for grid, rating in rate_all(grids, processes=2)] == ratings
+    assert any(rating['rule'] in rules.RULES for rating in ratings)
+    model = calibrate(grids, ['bitmask', 'dlx'], ratings)
+    assert all(model[name]['rate']['search'] == 1.0 for name in model)
+    costs = predict(model, hard)
+    assert choose(model, hard) == min(costs, key=costs.get) and all(cost > 0 for cost in costs.values())
+    model['dlx']['rate']['search'] = 0.0
+    assert choose(model, hard) == 'bitmask'  ## A solver that never solves such puzzles is never chosen
+    print('All tests pass.')
+
+
+################ Rating ################
+
+def rate(grid):
+    "The rating of grid (rule 'invalid' if propagation finds a contradiction)."
+    values = norvigBitmask.parse_grid(grid)
+    rating = {'rule': 'invalid', 'level': len(LEVELS), 'grade': 'invalid', 'nodes': 0, 'backtracks': 0,
+              'clues': sum(c in digits for c in grid)}
+    if values is False:
+        return rating
+    counts = {'nodes': 0, 'backtracks': 0}
+    if not norvigBitmask.search(values[:], counts):
+        return rating
+    rating.update(counts)
+    rating['rule'] = hardest_rule(values)
+    rating['level'] = LEVELS.index(rating['rule'])
+    rating['grade'] = GRADES[rating['rule']]
+    return rating
+
+
+def hardest_rule(values):
+    """The hardest rule it takes to solve values (propagated singles) with
+    rules.apply_rules: the costliest rule that found anything, or 'search'."""
+    if all(popcount[v] == 1 for v in values):
+        return 'singles'
+    stats = rules.new_stats()
+    values = rules.apply_rules(values, list(rules.RULES), stats)
+    if not values or not all(popcount[v] == 1 for v in values):
+        return 'search'
+    used = [name for name in LEVELS[1:-1] if stats[name]['hits']]
+    return used[-1]
+
+
+def rate_all(grids, processes=1):
+    "Yield (grid, rating) for each of grids, in order, rated on processes worker processes."
+    for grid, t, rating in batch.solve_stream(rate, grids, processes):
+        yield grid, rating
+
+
+################ Choosing a solver ################
+
+def calibrate(grids, names=CANDIDATES, ratings=None):
+    """Time each solver in names on grids, and fit its model: seconds as
+    a + b * nodes by least squares, and its solve rate for each rule."""
+    from . import bench
+    if ratings is None:
+        ratings = [rating for grid, rating in rate_all(grids)]
+    model = {}
+    for name in names:
+        solve, module = bench.solver(name)
+        xs, ts, tries = [], [], {}
+        for grid, rating in zip(grids, ratings):
+            t, values = batch.time_solve(solve, grid)
+            xs.append(rating['nodes'])
+            ts.append(t)
+            ok = bool(values) and module.solved(values)
+            n, k = tries.get(rating['rule'], (0, 0))
+            tries[rating['rule']] = (n + 1, k + ok)
+        a, b = fit(xs, ts)
+        model[name] = {'a': a, 'b': b, 'rate': dict((rule, k / n) for rule, (n, k) in tries.items())}
+    return model
+
+
+def fit(xs, ys):
+    "The least-squares line y = a + b * x through the points, as (a, b)."
+    n = len(xs)
+    mx, my = sum(xs) / n, sum(ys) / n
+    sxx = sum((x - mx) ** 2 for x in xs)
+    b = sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sxx if sxx else 0.0
+    return my - b * mx, b
+
+
+def predict(model, rating):
+    """The expected seconds each solver of model takes to solve a puzzle with
+    rating: its fitted time over its solve rate on the puzzle's rule
+    (infinite if it never solved one)."""
+    costs = {}
+    for name, m in model.items():
+        t = max(m['a'] + m['b'] * rating['nodes'], 1e-6)
+        rate = m['rate'].get(rating['rule'], min(m['rate'].values()))  ## Unseen rule: its worst rate
+        costs[name] = t / rate if rate else float('inf')
+    return costs
+
+
+def choose(model, rating):
+    "The solver of model with the smallest predicted cost for a puzzle with rating."
+    costs = predict(model, rating)
+    return min(costs, key=costs.get)
+
+
+################ System test ################
+
+def rate_file(grids, name='', processes=1):
+    "Rate every grid, and print how many need each rule, with their search trees. Return the ratings."
+    start = time.perf_counter()
+    ratings = [rating for grid, rating in rate_all(grids, processes)]
+    t = time.perf_counter() - start
+    print("Rated %d %s puzzles in %.2f secs (%d Hz)." % (len(ratings), name, t, len(ratings) / t))
+    print("  %-15s %-9s %7s %10s %10s %10s" % ('rule', 'grade', 'puzzles', 'avg nodes', 'max nodes',
+                                              'avg clues'))
+    for rule in LEVELS + ['invalid']:
+        group = [rating for rating in ratings if rating['rule'] == rule]
+        if group:
+            print("  %-15s %-9s %7d %10.1f %10d %10.1f" % (
+                rule, GRADES.get(rule, 'invalid'), len(group), sum(r['nodes'] for r in group) / len(group),
+                max(r['nodes'] for r in group), sum(r['clues'] for r in group) / len(group)))
+    return ratings
+
+
+def show_model(model):
+    "Print a fitted model: each solver's time line and solve rate per rule."
+    rules_seen = [rule for rule in LEVELS if any(rule in m['rate'] for m in model.values())]
+    print("  %-13s %10s %12s  %s" % ('solver', 'a (ms)', 'b (ms/node)', '  '.join(
+        '%6s' % rule[:6] for rule in rules_seen)))
+    for name, m in model.items():
+        print("  %-13s %10.3f %12.4f  %s" % (name, 1000 * m['a'], 1000 * m['b'], '  '.join(
+            '%6s' % ('%.2f' % m['rate'][rule] if rule in m['rate'] else '-') for rule in rules_seen)))
+
+
+def from_file(filename, sep='\n'):
+    "Parse a file into a list of strings, separated by sep."
+    return open(filename).read().strip().split(sep)
+
+
+grid1 = '003020600900305001001806400008102900700000008006708200002609500800203009005010300'
+grid2 = '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......'
+hard1 = '.....6....59.....82....8....45........3........6..3.54...325..6..................'
+
+if __name__ == '__main__':
+    test()
+    ratings = rate_file(from_file("1000sudoku.txt"), "hard")
+    grids = from_file("top95.txt")
+    model = calibrate(grids)
+    show_model(model)
+    picks = [choose(model, rating) for grid, rating in rate_all(grids)]
+    print("Chosen for top95:", ', '.join('%s %d' % (name, picks.count(name)) for name in model))
@@ -0,0 +1,173 @@
+## Fail when a fresh benchmark is slower than the committed baseline
+
+## benchmarks/baseline.json is a report saved by bench.py. check() runs the
+## same solvers on the same corpora with the same settings and compares each
+## (solver, corpus) pair on two measures: throughput, from each trial's total
+## seconds, and tail latency, each trial's p95. A measure regresses when the
+## new median is worse than the baseline's by more than threshold (20% by
+## default) and a one-sided permutation test says the difference is unlikely
+## to be noise (p below alpha). The test is against the baseline samples
+## made worse by threshold, so it asks whether the new run is slower than
+## what the threshold allows, not merely slower.
+## Raw seconds are not compared: the same code on the same machine runs at
+## half speed when the host is busy. Each trial's samples are divided by the
+## seconds of bench.py's calibration workload, timed just before the trial,
+## and multiplied by the baseline's median calibration, so both runs are in
+## seconds of the machine as it was when the baseline was recorded. A busy
+## host slows the workload and the solvers alike; a slower solver does not
+## slow the workload.
+## With 5 trials a side there are 252 ways to split the 10 samples, so the
+## test is exact. It needs at least 2 new trials: against 5 baseline trials,
+## 1 can do no better than p = 1/6, and the gate could never fail.
+## To re-record the baseline, after changing machines or after a change that
+## is meant to move the numbers, run python -m sudoku regress --update on a
+## quiet machine: it reruns the benchmark, prints the comparison, and saves
+## the fresh run, calibration included, as benchmarks/baseline.json.
+
+## Throughout this program we have:
+##   base and new are two bench.py reports, or two results for the same pair
+##   samples is a list of numbers, one per trial; larger is worse for all of them
+##   row is one line of the comparison: (solver, corpus, measure, base median,
+##   new median, change, p, verdict)
+
+import itertools
+import os
+import random
+
+from . import bench
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    assert permutation_p([1, 2, 3], [4, 5, 6]) == 1 / 20
+    assert permutation_p([4, 5, 6], [1, 2, 3]) == 1.0
+    assert permutation_p(list(range(20)), list(range(20, 40)), rounds=2000) < 0.01
+    base = {'solver': 'norvig', 'corpus': 'top95.txt', 'N': 10,
+            'trial_seconds': [1.0, 1.1, 0.9, 1.0, 1.05], 'trial_p95': [0.01] * 5,
+            'trial_calibration': [0.03] * 5}
+    slow = dict(base, trial_seconds=[2.0, 2.1, 1.9, 2.0, 2.05])
+    rows = compare({'results': [base]}, {'results': [slow]})
+    assert [(row[2], row[-1]) for row in rows] == [('throughput', 'REGRESSED'), ('p95', 'ok')]
+    ## A machine at half speed takes twice as long for the workload too: no regression
+    busy = dict(slow, trial_p95=[0.02] * 5, trial_calibration=[0.06] * 5)
+    rows = compare({'results': [base]}, {'results': [busy]})
+    assert all(row[-1] == 'ok' for row in rows) and abs(rows[0][4] - 10) < 0.5
+    assert all(row[-1] == 'ok' for row in compare({'results': [base]}, {'results': [base]}))
+    assert compare({'results': [base]}, {'results': []})[0][-1] == 'missing'
+    print('All tests pass.')
+
+
+################ Statistics ################
+
+def median(samples):
+    "The median of samples."
+    s = sorted(samples)
+    n = len(s)
+    return (s[(n - 1) // 2] + s[n // 2]) / 2
+
+
+def permutation_p(base, new, rounds=20000):
+    """One-sided permutation test: the chance that, if base and new came from
+    the same distribution, the mean of new would exceed the mean of base by
+    at least as much as it does. Exact when there are at most rounds ways to
+    split the samples, else estimated from rounds random splits."""
+    pooled = list(base) + list(new)
+    n = len(new)
+    observed = sum(new) / n - sum(base) / len(base)
+    total = sum(pooled)
+
+    def as_extreme(chosen):
+        s = sum(chosen)
+        return s / n - (total - s) / len(base) >= observed - 1e-12
+
+    splits = 1
+    for i in range(n):
+        splits = splits * (len(pooled) - i) // (i + 1)
+    if splits <= rounds:
+        hits = sum(as_extreme(chosen) for chosen in itertools.combinations(pooled, n))
+        return hits / splits
+    rng = random.Random(0)
+    hits = sum(as_extreme(rng.sample(pooled, n)) for _ in range(rounds))
+    return (hits + 1) / (rounds + 1)
+
+
+################ Comparing ################
+
+def measures(result, scale):
+    """The samples of each measure of a result, larger being worse: seconds
+    per puzzle, and p95, each divided by its trial's calibration seconds and
+    multiplied by scale."""
+    calibration = result['trial_calibration']
+    return [('throughput', [t / result['N'] / c * scale for t, c in zip(result['trial_seconds'], calibration)]),
+            ('p95', [t / c * scale for t, c in zip(result['trial_p95'], calibration)])]
+
+
+def compare(base, new, threshold=0.20, alpha=0.05):
+    """Compare every result of report new with the same pair in report base,
+    both calibrated to base's speed. Return the rows."""
+    fresh = dict(((r['solver'], r['corpus']), r) for r in new['results'])
+    rows = []
+    for b in base['results']:
+        key = (b['solver'], b['corpus'])
+        if key not in fresh:
+            rows.append(key + ('all', None, None, None, None, 'missing'))
+            continue
+        scale = median(b['trial_calibration'])
+        for (measure, old), (_, samples) in zip(measures(b, scale), measures(fresh[key], scale)):
+            before, after = median(old), median(samples)
+            change = after / before - 1 if before else 0.0
+            p = permutation_p([x * (1 + threshold) for x in old], samples)
+            verdict = 'REGRESSED' if change > threshold and p < alpha else 'ok'
+            if measure == 'throughput':  ## Report puzzles per second, not seconds per puzzle
+                before, after = 1 / before, 1 / after
+            rows.append(key + (measure, before, after, change, p, verdict))
+    return rows
+
+
+def report(rows):
+    "Print the rows of a comparison as a table, new numbers calibrated to the baseline's machine."
+    print('%-15s %-15s %-10s %12s %12s %8s %7s  %s' % (
+        'solver', 'corpus', 'measure', 'baseline', 'new', 'slower', 'p', 'verdict'))
+    for solver, corpus, measure, before, after, change, p, verdict in rows:
+        if before is None:
+            print('%-15s %-15s %-10s %12s %12s %8s %7s  %s' % (solver, corpus, measure, '', '', '', '', verdict))
+            continue
+        unit = ' Hz' if measure == 'throughput' else ' ms'
+        scale = 1 if measure == 'throughput' else 1000
+        print('%-15s %-15s %-10s %9.2f%s %9.2f%s %+7.1f%% %7.3f  %s' % (
+            solver, corpus, measure, before * scale, unit, after * scale, unit, 100 * change, p, verdict))
+
+
+def check(baseline=BASELINE, threshold=0.20, alpha=0.05, **settings):
+    """Run the baseline's benchmark again (with any settings overridden),
+    print the comparison, and return (passed, the new report). The corpora
+    are read from the current directory if they are there, else from ROOT."""
+    base = bench.load(baseline)
+    meta = base['meta']
+    names = list(dict.fromkeys(r['solver'] for r in base['results']))
+    corpora = [corpus if os.path.exists(corpus) else os.path.join(ROOT, corpus)
+               for corpus in dict.fromkeys(r['corpus'] for r in base['results'])]
+    options = dict((k, meta[k]) for k in ('trials', 'warmup', 'limit', 'seed'))
+    options.update((k, v) for k, v in settings.items() if v is not None)
+    if options['trials'] < 2:
+        raise ValueError('the gate needs at least 2 trials: with 1, no slowdown is significant')
+    new = bench.run(names, corpora, **options)
+    if not all('trial_calibration' in r for r in base['results']):
+        print('%s was recorded without calibration, so nothing can be compared: '
+              're-record it with python -m sudoku regress --update.' % baseline)
+        return False, new
+    rows = compare(base, new, threshold, alpha)
+    report(rows)
+    regressed = [row for row in rows if row[-1] != 'ok']
+    print('%d of %d checks regressed (threshold %.0f%%, alpha %.2f).' % (
+        len(regressed), len(rows), 100 * threshold, alpha))
+    return not regressed, new
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,358 @@
+## Inference rules beyond singles, applied cheapest first
+
+## norvigBitmask.propagate knows two rules, naked and hidden singles. This
+## module adds more of the techniques people use by hand, each as a rule in
+## a registry with a cost. A rule looks at the candidate masks and returns
+## the eliminations it can justify; it does not change anything itself.
+## apply_rules runs the registered rules in order of cost: whenever one finds
+## something, the eliminations are made, the singles are propagated to their
+## fixpoint again, and the scheduler goes back to the cheapest rule, so an
+## expensive rule only runs on a grid that none of the cheaper ones can help.
+## Each rule's calls, hits, eliminations and time are counted in stats, and
+## compare_mixes times whole sets of rules against each other on a corpus.
+
+## Throughout this program we have:
+##   values is a list of 81 masks, as in norvigBitmask.py
+##   d is a digit bit, e.g. 4 for '3'
+##   found is a list of eliminations (s, bits): remove bits from values[s];
+##   or False when a rule meets a contradiction
+##   RULES maps a rule's name to (cost, function from values to found)
+##   names is a list of rule names to use, e.g. ['naked_pairs', 'x_wing']
+##   stats is None, or a dict from rule name to its counters
+
+import functools
+import itertools
+import time
+
+from .topology import digits, unitlist, unit_bits, col_units, row_units, box_units
+from . import batch
+from . import norvigBitmask
+from . import stream
+from .norvigBitmask import popcount
+
+BITS = [1 << k for k in range(9)]
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    assert [name for name in by_cost(RULES)][0] == 'naked_pairs'
+    ## Row A: A1 and A2 can only be 1 or 2, so A3 can't be either.
+    values = [norvigBitmask.ALL] * 81
+    values[0] = values[1] = 0b11
+    assert (2, 0b11) in naked_pairs(values)
+    ## Box 1: 1 only in A1 and A2 of that box, so 1 is not elsewhere in row A.
+    values = [norvigBitmask.ALL] * 81
+    for s in (2, 9, 10, 11, 18, 19, 20):
+        values[s] &= ~1
+    assert (5, 1) in pointing_pairs(values) and all(s in row_units[0] for s, d in pointing_pairs(values))
+    ## Row A: 1 only in A1 and A2, so it is not elsewhere in box 1.
+    values = [norvigBitmask.ALL] * 81
+    for s in range(2, 9):
+        values[s] &= ~1
+    assert (9, 1) in box_line(values)
+    ## Digits 1 and 2 only in A1 and A2 of row A: those squares are just 1 or 2.
+    values = [norvigBitmask.ALL] * 81
+    for s in range(2, 9):
+        values[s] &= ~0b11
+    assert (0, norvigBitmask.ALL & ~0b11) in hidden_pairs(values)
+    ## 1 only in columns 1 and 5 of rows A and E: no 1 elsewhere in those columns.
+    values = [norvigBitmask.ALL] * 81
+    for r in (0, 4):
+        for c in range(9):
+            if c not in (0, 4):
+                values[r * 9 + c] &= ~1
+    assert set(x_wing(values)) == set((r * 9 + c, 1) for c in (0, 4) for r in range(9) if r not in (0, 4))
+    stats = new_stats()
+    assert solved(solve(grid2, list(RULES), stats)) and solved(solve(hard1, list(RULES), stats))
+    assert all(stats[name]['calls'] > 0 for name in stats)
+    values, stats = solve_counted(hard1, list(RULES))
+    assert solved(values) and stats['x_wing']['calls'] > 0 and solve_counted(grid2)[0] == solve(grid2)
+    total = new_stats()
+    add_stats(total, stats)
+    add_stats(total, stats)
+    assert total['x_wing']['calls'] == 2 * stats['x_wing']['calls']
+    assert table(total, list(RULES)).count('\n') == len(RULES) + 1  ## A header, singles, and each rule
+    assert solve('11' + '.' * 79) is False
+    print('All tests pass.')
+
+
+################ Rules ################
+
+def naked_pairs(values):
+    "Two squares of a unit with the same two values: no other square of the unit has them."
+    found = []
+    for u in unitlist:
+        seen = {}
+        for s in u:
+            v = values[s]
+            if popcount[v] == 2:
+                if v in seen:
+                    if seen[v] < 0:
+                        return False  ## Three squares for two values
+                    for s2 in u:
+                        if s2 != s and s2 != seen[v] and values[s2] & v:
+                            found.append((s2, v))
+                    seen[v] = -1
+                else:
+                    seen[v] = s
+    return found
+
+
+def hidden_pairs(values):
+    "Two values with the same two places in a unit: those squares have no other values."
+    found = []
+    for u in unitlist:
+        places = {}  ## The 2 squares of a value with 2 places -> its digit bits
+        for d in BITS:
+            where = tuple(s for s in u if values[s] & d)
+            if len(where) == 2:
+                places[where] = places.get(where, 0) | d
+        for where, pair in places.items():
+            if popcount[pair] == 2:
+                for s in where:
+                    if values[s] & ~pair:
+                        found.append((s, values[s] & ~pair))
+            elif popcount[pair] > 2:
+                return False  ## Three values for two squares
+    return found
+
+
+def pointing_pairs(values):
+    "A value that, in a box, is only in one row (or column): no other square of that row has it."
+    found = []
+    for box in box_units:
+        for d in BITS:
+            where = [s for s in box if values[s] & d]
+            if len(where) < 2:
+                continue  ## Hidden singles and contradictions are propagate's job
+            for line in (row_units[where[0] // 9], col_units[where[0] % 9]):
+                if all(s in line for s in where):
+                    found.extend((s, d) for s in line if s not in box and values[s] & d)
+    return found
+
+
+def box_line(values):
+    "A value that, in a row or column, is only in one box: no other square of that box has it."
+    found = []
+    for line in row_units + col_units:
+        for d in BITS:
+            where = [s for s in line if values[s] & d]
+            if len(where) < 2:
+                continue
+            box = box_units[where[0] // 27 * 3 + where[0] % 9 // 3]
+            if all(s in box for s in where):
+                found.extend((s, d) for s in box if s not in line and values[s] & d)
+    return found
+
+
+def x_wing(values):
+    """A value with the same two places in two rows: it is in those two
+    columns there, so nowhere else in them; and the same for columns."""
+    found = []
+    for lines, across in ((row_units, col_units), (col_units, row_units)):
+        for d in BITS:
+            pairs = {}  ## Positions (i, j) in the line -> the lines with d only there
+            for n, line in enumerate(lines):
+                where = tuple(i for i, s in enumerate(line) if values[s] & d)
+                if len(where) == 2:
+                    pairs.setdefault(where, []).append(n)
+            for where, ns in pairs.items():
+                if len(ns) > 2:
+                    return False  ## Three lines, two places
+                if len(ns) == 2:
+                    for i in where:
+                        found.extend((s, d) for n, s in enumerate(across[i])
+                                     if n not in ns and values[s] & d)
+    return found
+
+
+RULES = {'naked_pairs': (1, naked_pairs),
+         'pointing_pairs': (2, pointing_pairs),
+         'box_line': (2, box_line),
+         'hidden_pairs': (3, hidden_pairs),
+         'x_wing': (4, x_wing)}
+
+
+## The fastest mix on 1000sudoku.txt is no rules at all, singles only (see
+## compare_mixes): there, what any rule saves in search costs more than it saves.
+default_rules = ()
+
+
+def by_cost(names):
+    "The rule names, cheapest first (ties in the order given)."
+    return sorted(names, key=lambda name: RULES[name][0])
+
+
+################ Scheduler ################
+
+def new_stats(names=RULES):
+    """Counters for each rule, and for the singles that follow the rules'
+    eliminations: calls, calls that found something, eliminations, seconds."""
+    return dict((name, {'calls': 0, 'hits': 0, 'eliminated': 0, 'time': 0.0})
+                for name in ['singles'] + list(names))
+
+
+def eliminate_all(values, found, stats=None):
+    "Make the eliminations found, then propagate singles. Return values, or False on a contradiction."
+    start = time.perf_counter()
+    fixed = []
+    dirty = 0
+    for s, bits in found:
+        v = values[s] & ~bits
+        if v != values[s]:
+            if not v:
+                return False  ## Contradiction: removed last value
+            values[s] = v
+            dirty |= unit_bits[s]
+            if not v & (v - 1):
+                fixed.append(s)
+    if stats is None:
+        return norvigBitmask.propagate(values, fixed, dirty)
+    before = sum(popcount[v] for v in values)
+    result = norvigBitmask.propagate(values, fixed, dirty)
+    eliminated = result and before - sum(popcount[v] for v in values)
+    count(stats, 'singles', start, eliminated, eliminated)
+    return result
+
+
+def count(stats, name, start, hit, eliminated=0):
+    "Add a call of rule name, begun at time start, to stats (if any)."
+    if stats is not None:
+        c = stats[name]
+        c['calls'] += 1
+        c['hits'] += bool(hit)
+        c['eliminated'] += eliminated
+        c['time'] += time.perf_counter() - start
+
+
+def apply_rules(values, names, stats=None):
+    """Apply the rules names to a fixpoint, cheapest first, going back to the
+    cheapest after any rule finds something. Return values, or False."""
+    order = by_cost(names)
+    while values:
+        for name in order:
+            start = time.perf_counter()
+            found = RULES[name][1](values)
+            count(stats, name, start, found, len(found) if found else 0)
+            if found is False:
+                return False
+            if found:
+                values = eliminate_all(values, found, stats)
+                break
+        else:
+            return values  ## No rule finds anything more
+    return values
+
+
+################ Search ################
+
+def solve(grid, names=default_rules, stats=None):
+    "Solve grid with singles and the rules names; return a list of 81 digits, or False."
+    values = search(norvigBitmask.parse_grid(grid), names, stats)
+    return values and [norvigBitmask.bit_digit[v] for v in values]
+
+
+def search(values, names, stats=None):
+    "Using depth-first search, singles and the rules names, try all possible values."
+    values = values and apply_rules(values, names, stats)
+    if values is False:
+        return False  ## Failed earlier
+    ## Chose the unfilled square s with the fewest possibilities
+    n, s = 10, None
+    for s2, v in enumerate(values):
+        if 1 < popcount[v] < n:
+            n, s = popcount[v], s2
+    if s is None:
+        return values  ## Solved!
+    ds = values[s]
+    while ds:
+        d = ds & -ds
+        result = search(norvigBitmask.assign(values[:], s, d), names, stats)
+        if result:
+            return result
+        ds ^= d
+    return False
+
+
+################ System test ################
+
+def solve_counted(grid, names=default_rules):
+    "Solve grid as solve does; return (values, each rule's counts for this grid)."
+    stats = new_stats(names)
+    return solve(grid, names, stats), stats
+
+
+def solve_all(grids, name='', names=default_rules, processes=1):
+    """Attempt to solve a sequence of grids with the rules names, on
+    processes worker processes (None for one per core). Report results, and
+    each rule's counts. Return the seconds spent solving."""
+    totals = stream.new_totals()
+    stats = new_stats(names)
+    start = time.perf_counter()
+    for grid, t, (values, puzzle_stats) in batch.solve_stream(functools.partial(solve_counted, names=names),
+                                                                grids, processes):
+        add_stats(stats, puzzle_stats)
+        stream.add(totals, t, solved(values), grid)
+    wall = time.perf_counter() - start if processes != 1 else None
+    if totals['N'] > 1:
+        print(stream.summary(totals, name, wall))
+        print(stream.latency(totals))
+        print(table(stats, names))
+    return totals['time']
+
+
+def add_stats(total, stats):
+    "Add one solve's stats (see solve_counted) to total, rule by rule."
+    for rule, counts in stats.items():
+        stream.add_counts(total[rule], counts)
+
+
+def table(stats, names):
+    "Each rule's counts in stats, singles first, then the rules names cheapest first, as a table."
+    lines = ["  %-15s %8s %8s %10s %8s" % ('rule', 'calls', 'hits', 'eliminated', 'secs')]
+    for rule in ['singles'] + by_cost(names):
+        lines.append("  %-15s %8d %8d %10d %8.2f" % ((rule,) + tuple(
+            stats[rule][k] for k in ('calls', 'hits', 'eliminated', 'time'))))
+    return '\n'.join(lines)
+
+
+def compare_mixes(grids, name='', mixes=None):
+    """Time every mix of rules (by default, every subset of RULES) on grids,
+    and print them from fastest to slowest."""
+    if mixes is None:
+        mixes = [combo for n in range(len(RULES) + 1) for combo in itertools.combinations(RULES, n)]
+    grids = list(grids)
+    timed = []
+    for names in mixes:
+        start = time.perf_counter()
+        ok = sum(solved(solve(grid, names)) for grid in grids)
+        timed.append((time.perf_counter() - start, ok, names))
+    print("Rule mixes on %d %s puzzles, fastest first:" % (len(grids), name))
+    for t, ok, names in sorted(timed):
+        print("  %7.2f secs  %4d solved  %s" % (t, ok, ', '.join(names) or '(singles only)'))
+
+
+def solved(values):
+    "A puzzle is solved if each unit is a permutation of the digits 1 to 9."
+
+    def unitsolved(unit): return set(values[s] for s in unit) == set(digits)
+
+    return values is not False and all(unitsolved(unit) for unit in unitlist)
+
+
+def from_file(filename, sep='\n'):
+    "Parse a file into a list of strings, separated by sep."
+    return open(filename).read().strip().split(sep)
+
+
+grid2 = '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......'
+hard1 = '.....6....59.....82....8....45........3........6..3.54...325..6..................'
+
+if __name__ == '__main__':
+    test()
+    solve_all(from_file("top95.txt"), "95sudoku")
+    solve_all(from_file("1000sudoku.txt"), "hard")
+    solve_all(from_file("1000sudoku.txt"), "hard (all rules)", list(RULES))
+    # compare_mixes(from_file("1000sudoku.txt"), "hard")
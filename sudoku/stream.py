@@ -0,0 +1,205 @@
+## Read puzzle files lazily and keep running totals of a solve
+
+## from_file reads a whole corpus into one string and splits it into a list
+## before the first puzzle is solved. read_grids yields the puzzles one at a
+## time as it reads, and the totals below take one solved puzzle at a time
+## and keep only counts, sums, a maximum, a latency histogram of fixed size
+## and the few slowest puzzles, so a report over a dump of any size needs
+## the same memory as a report over ten puzzles.
+
+## The histogram is HDR-style: times are counted in whole microseconds, in
+## buckets that are exact below 64 us and above that split every power of
+## two into 32 equal parts, so any time is known to within about 3% (1/32),
+## from a microsecond up to over an hour, in 896 counters. A percentile is
+## read off it as the top of the bucket that holds it (never above the
+## maximum); it is never below the true nearest-rank percentile.
+
+## Throughout this program we have:
+##   totals is a dict of running counts: {'N', 'solved', 'timed_out', 'time',
+##   'max', 'histogram', 'slowest', 'keep'}
+##   histogram is a list of counts, one per bucket; i is a bucket's index
+##   slowest is a heap of the keep slowest puzzles: (seconds, -n, grid),
+##   where n is the puzzle's place in the stream, counting from 1
+
+import heapq
+import io
+import json
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    assert list(read_grids("top95.txt")) == open("top95.txt").read().strip().split('\n')
+    text = '\n1.3\n========\n4.6\n\n========\n789\n'
+    assert [g.split() for g in read_lines(io.StringIO(text), '========', 4)] == \
+           [['1.3'], ['4.6'], ['789']]
+    totals = new_totals(keep=2)
+    for t, ok, grid in [(0.5, True, 'a'), (1.5, False, 'b'), (1.0, True, 'c')]:
+        add(totals, t, ok, grid)
+    assert (totals['N'], totals['solved'], totals['time'], totals['max']) == (3, 2, 3.0, 1.5)
+    assert summary(totals, 'test') == \
+           "Solved 2 of 3 test puzzles (avg 1.00 secs (1 Hz), max 1.50 secs)."
+    assert slowest(totals) == [(1.5, 2, 'b'), (1.0, 3, 'c')]
+    add(totals, 2.0, False, 'd', timed_out=True)
+    assert summary(totals, 'test') == \
+           "Solved 2 of 4 test puzzles, 1 timed out (avg 1.25 secs (0 Hz), max 2.00 secs)."
+    assert [bucket(us) for us in (0, 63, 64, 65, 66, 127, 128)] == [0, 63, 64, 64, 65, 95, 96]
+    assert all(bounds(bucket(us))[0] <= us <= bounds(bucket(us))[1] for us in range(100000))
+    assert bucket(10 ** 12) == len(totals['histogram']) - 1 == 895  ## Off the top: the last bucket
+    assert 1.0 <= percentile(totals, 50) <= 1.0 * 33 / 32 and percentile(totals, 100) == 2.0
+    totals = new_totals()
+    for us in range(1, 1001):
+        add(totals, us / 1e6, True)
+    assert 990 <= percentile(totals, 99) * 1e6 <= 990 * 33 / 32 and percentile(totals, 100) == 1e-3
+    assert latency(totals).split('\n')[:2] == [
+        '  latency p50 0.50 ms, p90 0.91 ms, p99 0.99 ms, p99.9 1.00 ms, max 1.00 ms', '       1.00 ms  #1000']
+    data = json.loads(json.dumps(report(totals, 'test')))
+    assert data['N'] == 1000 and sum(n for low, high, n in data['histogram']) == 1000
+    assert data['percentiles']['p50'] == percentile(totals, 50) and len(data['slowest']) == 5
+    counts = {}
+    add_counts(counts, {'nodes': 3, 'max_depth': 2})
+    add_counts(counts, {'nodes': 4, 'max_depth': 1})
+    assert counts == {'nodes': 7, 'max_depth': 2} and counts_line(counts) == 'nodes 7, max depth 2'
+    print('All tests pass.')
+
+
+################ Reading ################
+
+def read_grids(filename, sep='\n'):
+    "Yield the puzzles of a file one by one, separated by sep, skipping blank ones."
+    with open(filename) as f:
+        for grid in read_lines(f, sep):
+            yield grid
+
+
+def read_lines(f, sep='\n', blocksize=1 << 16):
+    "Yield the non-blank pieces of an open file between seps, reading blocksize chars at a time."
+    if sep == '\n':
+        for line in f:
+            if line.strip():
+                yield line.rstrip('\n')
+        return
+    rest = ''
+    for block in iter(lambda: f.read(blocksize), ''):
+        pieces = (rest + block).split(sep)
+        rest = pieces.pop()  ## May continue in the next block
+        for piece in pieces:
+            if piece.strip():
+                yield piece
+    if rest.strip():
+        yield rest
+
+
+################ Running totals ################
+
+SUB_BITS = 5                              ## 2**5 = 32 buckets per power of two
+TOP_BITS = 32                             ## 2**32 us, over an hour: larger times share the last bucket
+PERCENTILES = [50, 90, 99, 99.9]
+
+
+def new_totals(keep=5):
+    "Totals for no puzzles yet, keeping the keep slowest."
+    return {'N': 0, 'solved': 0, 'timed_out': 0, 'time': 0.0, 'max': 0.0,
+            'histogram': [0] * (bucket((1 << TOP_BITS) - 1) + 1), 'slowest': [], 'keep': keep}
+
+
+def add(totals, t, ok, grid=None, timed_out=False):
+    "Count one more puzzle, solved or not (or given up on, if timed_out), that took t seconds."
+    totals['N'] += 1
+    totals['solved'] += bool(ok)
+    totals['timed_out'] += bool(timed_out)
+    totals['time'] += t
+    totals['max'] = max(totals['max'], t)
+    totals['histogram'][bucket(int(t * 1e6))] += 1
+    if totals['keep']:
+        entry = (t, -totals['N'], grid)  ## On equal times, the earlier puzzle stays
+        if len(totals['slowest']) < totals['keep']:
+            heapq.heappush(totals['slowest'], entry)
+        elif entry > totals['slowest'][0]:
+            heapq.heapreplace(totals['slowest'], entry)
+
+
+################ Latency histogram ################
+
+def bucket(us):
+    "The index of the histogram bucket for a time of us microseconds."
+    us = min(us, (1 << TOP_BITS) - 1)
+    e = max(us.bit_length() - SUB_BITS - 1, 0)
+    return (e << SUB_BITS) + (us >> e)
+
+
+def bounds(i):
+    "The lowest and highest microseconds that go in bucket i."
+    e = max((i >> SUB_BITS) - 1, 0)
+    low = (i - (e << SUB_BITS)) << e
+    return low, low + (1 << e) - 1
+
+
+def percentile(totals, p):
+    """The p-th percentile of the times in totals, in seconds: the top of the
+    bucket holding the nearest-rank p-th time, or the maximum if less."""
+    rank = max(1, -(-totals['N'] * p // 100))
+    seen = 0
+    for i, n in enumerate(totals['histogram']):
+        seen += n
+        if seen >= rank:
+            return min((bounds(i)[1] + 1) / 1e6, totals['max'])
+    return totals['max']
+
+
+def slowest(totals):
+    "The slowest puzzles kept, slowest first: (seconds, place in the stream, grid)."
+    return [(t, -n, grid) for t, n, grid in sorted(totals['slowest'], reverse=True)]
+
+
+def add_counts(total, counts):
+    "Add a solve's counters (see norvig.solve_counted) to total: max_ ones by maximum, the others by sum."
+    for k, v in counts.items():
+        total[k] = max(total.get(k, 0), v) if k.startswith('max_') else total.get(k, 0) + v
+
+
+def counts_line(counts):
+    "The counters as one line, e.g. 'nodes 12, backtracks 3, ...'."
+    return ', '.join('%s %d' % (k.replace('_', ' '), v) for k, v in counts.items())
+
+
+def summary(totals, name='', wall=None):
+    """The solve_all report line. Hz is puzzles per second of solving time,
+    or per second of wall time when wall is given (for a parallel run)."""
+    N = totals['N']
+    timed_out = ', %d timed out' % totals['timed_out'] if totals['timed_out'] else ''
+    return "Solved %d of %d %s puzzles%s (avg %.2f secs (%d Hz), max %.2f secs)." % (
+        totals['solved'], N, name, timed_out, totals['time'] / N, N / (wall or totals['time']), totals['max'])
+
+
+def latency(totals):
+    "The latency report that follows the summary line: percentiles, then the slowest puzzles."
+    lines = ['  latency ' + ', '.join('p%s %.2f ms' % (p, 1000 * percentile(totals, p)) for p in PERCENTILES) +
+             ', max %.2f ms' % (1000 * totals['max'])]
+    for t, n, grid in slowest(totals):
+        lines.append(('  %9.2f ms  #%-6d %s' % (1000 * t, n, ''.join(grid.split()) if grid else '')).rstrip())
+    return '\n'.join(lines)
+
+
+def report(totals, name='', wall=None):
+    "The totals as a dict that can be saved as JSON: the summary, percentiles, histogram and slowest puzzles."
+    N = totals['N']
+    return {'name': name, 'N': N, 'solved': totals['solved'], 'timed_out': totals['timed_out'],
+            'time': totals['time'], 'wall': wall,
+            'mean': totals['time'] / N if N else 0.0, 'max': totals['max'],
+            'percentiles': dict(('p%s' % p, percentile(totals, p)) for p in PERCENTILES),
+            'histogram': [[low / 1e6, (high + 1) / 1e6, n] for (low, high), n in
+                          ((bounds(i), n) for i, n in enumerate(totals['histogram'])) if n],
+            'slowest': [{'seconds': t, 'n': n, 'grid': grid} for t, n, grid in slowest(totals)]}
+
+
+def save(reports, filename):
+    "Write a list of reports to filename as JSON."
+    with open(filename, 'w') as f:
+        json.dump(reports, f, indent=2)
+        f.write('\n')
+
+
+if __name__ == '__main__':
+    test()
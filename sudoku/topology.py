@@ -0,0 +1,89 @@
+## Sudoku board topology shared by the solvers
+
+## Squares are numbered 0..80 row by row, so square s sits in row s // 9 and
+## column s % 9: 'A1' is 0, 'A2' is 1, ..., 'I9' is 80. Every table below is
+## built from that arithmetic once, at import, and holds only integers and
+## tuples, so the solvers' inner loops never hash a square name. The
+## 'A1'-style names in squares are only for reading and printing grids.
+
+## Throughout this module we have:
+##   s is a square index, e.g. 19 for 'C2'
+##   u is a unit,         e.g. (0, 9, 18, 27, 36, 45, 54, 63, 72)
+##   i is a unit index,   e.g. 9 for the row unit of 'B...'; unitlist[i] == u
+
+digits = '123456789'
+rows = 'ABCDEFGHI'
+cols = digits
+squares = [r + c for r in rows for c in cols]  ## Square names, indexed by s
+index = dict((name, s) for s, name in enumerate(squares))  ## Name -> s
+
+
+## build(n) makes the tables of an n²×n² board (n² symbols, n×n boxes),
+## squares numbered row by row as above; this module's tables are build(3)'s.
+
+def build(n):
+    """The tables of an n²×n² board as a dict, with the names used below
+    and N, the side."""
+    N = n * n
+    col_units = tuple(tuple(r * N + c for r in range(N)) for c in range(N))
+    row_units = tuple(tuple(r * N + c for c in range(N)) for r in range(N))
+    box_units = tuple(tuple(r * N + c for r in range(br, br + n) for c in range(bc, bc + n))
+                      for br in range(0, N, n) for bc in range(0, N, n))
+    unitlist = col_units + row_units + box_units  ## Same order as norvig.py's unitlist
+    ## Cell -> units map: the column, row and box holding s, as positions in
+    ## unitlist and as the units themselves.
+    unit_indexes = tuple((s % N, N + s // N, 2 * N + s // (N * n) * n + s % N // n)
+                         for s in range(N * N))
+    units = tuple(tuple(unitlist[i] for i in unit_indexes[s]) for s in range(N * N))
+    return {'n': n, 'N': N, 'col_units': col_units, 'row_units': row_units, 'box_units': box_units,
+            'unitlist': unitlist, 'unit_indexes': unit_indexes, 'units': units,
+            'unit_bits': tuple(sum(1 << i for i in unit_indexes[s])
+                               for s in range(N * N)),  ## Bit i set when unitlist[i] holds s
+            'ALL_UNITS': (1 << len(unitlist)) - 1,
+            'peers': tuple(tuple(sorted(set(s2 for u in units[s] for s2 in u) - set([s])))
+                           for s in range(N * N))}
+
+
+_nine = build(3)
+col_units = _nine['col_units']
+row_units = _nine['row_units']
+box_units = _nine['box_units']
+unitlist = _nine['unitlist']
+unit_indexes = _nine['unit_indexes']
+units = _nine['units']
+unit_bits = _nine['unit_bits']
+ALL_UNITS = _nine['ALL_UNITS']
+peers = _nine['peers']
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    assert len(squares) == 81
+    assert len(unitlist) == 27
+    assert all(len(u) == 9 for u in unitlist)
+    assert all(len(units[s]) == 3 for s in range(81))
+    assert all(len(peers[s]) == 20 for s in range(81))
+    assert all(s in u for s in range(81) for u in units[s])
+    assert [[squares[s] for s in u] for u in units[index['C2']]] == \
+           [['A2', 'B2', 'C2', 'D2', 'E2', 'F2', 'G2', 'H2', 'I2'],
+            ['C1', 'C2', 'C3', 'C4', 'C5', 'C6', 'C7', 'C8', 'C9'],
+            ['A1', 'A2', 'A3', 'B1', 'B2', 'B3', 'C1', 'C2', 'C3']]
+    assert set(squares[s] for s in peers[index['C2']]) == \
+           set(['A2', 'B2', 'D2', 'E2', 'F2', 'G2', 'H2', 'I2',
+                'C1', 'C3', 'C4', 'C5', 'C6', 'C7', 'C8', 'C9',
+                'A1', 'A3', 'B1', 'B3'])
+    assert box_units[4] == (30, 31, 32, 39, 40, 41, 48, 49, 50) and unit_indexes[index['C2']] == (1, 11, 18)
+    assert unit_bits[0] == 1 | 1 << 9 | 1 << 18 and ALL_UNITS == (1 << 27) - 1
+    for n in (2, 4, 5):
+        board = build(n)
+        N = n * n
+        assert len(board['unitlist']) == 3 * N and all(len(u) == N for u in board['unitlist'])
+        assert all(len(p) == 3 * N - 2 * n - 1 for p in board['peers'])
+        assert all(s in u for s in range(N * N) for u in board['units'][s])
+    print('All tests pass.')
+
+
+if __name__ == '__main__':
+    test()
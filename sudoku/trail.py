@@ -0,0 +1,247 @@
+## Iterative depth-first search with an undo trail instead of per-branch copies
+
+## search() in norvig.py tries each digit on values.copy(), so every guess
+## allocates a fresh 81-entry list even when the branch fails straight away.
+## Here there is one values list for the whole search. eliminate() pushes
+## (s, old value) on a trail before it changes values[s], and backtracking
+## pops the trail back to where the branch started, restoring each square.
+## Propagation is the same as norvig.py's, so with the same choice of square
+## the search visits the same branches and finds the same solution.
+
+## Nothing here recurses either: search keeps its open guesses on an explicit
+## stack and propagation works off a queue, so the Python call depth stays
+## the same however deep the search or long the chain of eliminations.
+
+## Throughout this program we have:
+##   s is a square, e.g. 2 for 'A3' (see topology.py)
+##   d is a digit,  e.g. '9'
+##   values is a list of possible values, e.g. ['12349', '8', ...]
+##   trail is a list of (s, values[s] before the change), oldest first
+##   queue is a list of (s, d) eliminations still to carry out
+##   stats is None, or a dict of counters that search adds to
+##   rule is None, or a further rule for propagate: a function of (values, s),
+##   called after s changes, that returns the (s2, d2) eliminations it calls
+##   for, or False on a contradiction (e.g. norvigHeuristique's naked subsets)
+
+import sys
+
+from .topology import digits, unitlist, units, peers
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    values = parse_grid(grid2)
+    before = values[:]
+    trail = []
+    assert assign(values, 1, values[1][0], trail) and trail
+    undo(values, trail, 0)
+    assert values == before and trail == []
+    stats = new_stats()
+    assert solved(search(parse_grid(grid2), stats=stats))
+    assert stats['copies_avoided'] > 0
+    values, stats2 = solve_counted(grid2)
+    assert values == search(parse_grid(grid2)) and stats2 == stats
+    assert solved(solve(grid1, first_unfilled))
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(50)  ## Far below the depth of the recursive search
+    try:
+        assert solved(solve(grid2))
+    finally:
+        sys.setrecursionlimit(limit)
+    print('All tests pass.')
+
+
+################ Parse a Grid ################
+
+def parse_grid(grid):
+    """Convert grid to a list of possible values, [digits, ...], or
+    return False if a contradiction is detected."""
+    values = [digits] * 81
+    trail = []  ## Nothing to undo to; the trail is dropped
+    for s, d in enumerate(grid_values(grid)):
+        if d in digits and not assign(values, s, d, trail):
+            return False  ## (Fail if we can't assign d to square s.)
+    return values
+
+
+def grid_values(grid):
+    "Convert grid into a list of 81 chars with '0' or '.' for empties."
+    chars = [c for c in grid if c in digits or c in '0.']
+    assert len(chars) == 81
+    return chars
+
+
+################ Constraint Propagation ################
+
+## Neither assign nor eliminate recurses: they put (square, digit) eliminations
+## on a queue, and propagate works through it, appending the follow-up
+## eliminations of norvig.py's two rules instead of calling itself.
+
+def assign(values, s, d, trail, rule=None):
+    """Eliminate all the other values (except d) from values[s] and propagate.
+    Return values, except return False if a contradiction is detected."""
+    return propagate(values, [(s, d2) for d2 in values[s] if d2 != d], trail, rule)
+
+
+def eliminate(values, s, d, trail, rule=None):
+    """Eliminate d from values[s] and propagate.
+    Return values, except return False if a contradiction is detected."""
+    return propagate(values, [(s, d)], trail, rule)
+
+
+def propagate(values, queue, trail, rule=None):
+    """Carry out the (s, d) eliminations on queue and all that follow from them,
+    by norvig.py's two rules and rule (if any), recording each change on
+    trail. Return values, or False on a contradiction."""
+    while queue:
+        s, d = queue.pop()
+        if d not in values[s]:
+            continue  ## Already eliminated
+        trail.append((s, values[s]))
+        values[s] = values[s].replace(d, '')
+        ## (1) If a square s is reduced to one value d2, then eliminate d2 from the peers.
+        if len(values[s]) == 0:
+            return False  ## Contradiction: removed last value
+        elif len(values[s]) == 1:
+            d2 = values[s]
+            queue.extend((s2, d2) for s2 in peers[s] if d2 in values[s2])
+        ## (2) If a unit u is reduced to only one place for a value d, then put it there.
+        for u in units[s]:
+            dplaces = [s for s in u if d in values[s]]
+            if len(dplaces) == 0:
+                return False  ## Contradiction: no place for this value
+            elif len(dplaces) == 1:
+                # d can only be in one place in unit; assign it there
+                s2 = dplaces[0]
+                queue.extend((s2, d2) for d2 in values[s2] if d2 != d)
+        if rule is not None:
+            found = rule(values, s)
+            if found is False:
+                return False
+            queue.extend(found)
+    return values
+
+
+def undo(values, trail, mark):
+    "Pop the trail back to length mark, restoring every square it changed."
+    while len(trail) > mark:
+        s, v = trail.pop()
+        values[s] = v
+
+
+################ Search ################
+
+def mrv(values):
+    "The unfilled square with the fewest possibilities, as in norvig.py; None if solved."
+    if all(len(v) == 1 for v in values):
+        return None
+    n, s = min((len(v), s) for s, v in enumerate(values) if len(v) > 1)
+    return s
+
+
+def first_unfilled(values):
+    "The first unfilled square, as in norvigSansContrainte.py; None if solved."
+    for s, v in enumerate(values):
+        if len(v) > 1:
+            return s
+    return None
+
+
+def new_stats():
+    "Counters for search: each branch tried is a values.copy() avoided."
+    return {'copies_avoided': 0, 'max_trail': 0, 'max_depth': 0}
+
+
+def search(values, choose=mrv, stats=None, rule=None):
+    """Using depth-first search and propagation (with rule, if any), try all
+    possible values. values is changed in place: it is returned solved, or
+    restored and False is returned."""
+    if values is False:
+        return False  ## Failed earlier
+    s = choose(values)
+    if s is None:
+        return values  ## Solved!
+    ## The stack replaces the recursion: one (square, digits not yet tried,
+    ## trail length before the square was guessed) entry per open guess.
+    trail = []
+    stack = [(s, values[s], 0)]
+    while stack:
+        s, ds, mark = stack.pop()
+        undo(values, trail, mark)  ## Back out the previous digit tried here
+        if not ds:
+            continue  ## Every digit failed; backtrack further
+        stack.append((s, ds[1:], mark))
+        if stats is not None:
+            stats['copies_avoided'] += 1
+        if assign(values, s, ds[0], trail, rule):
+            if stats is not None:
+                stats['max_trail'] = max(stats['max_trail'], len(trail))
+                stats['max_depth'] = max(stats['max_depth'], len(stack))
+            s2 = choose(values)
+            if s2 is None:
+                return values  ## Solved!
+            stack.append((s2, values[s2], len(trail)))
+    return False
+
+
+def solve(grid, choose=mrv, stats=None): return search(parse_grid(grid), choose, stats)
+
+
+################ System test ################
+
+import functools
+import time
+
+from . import batch
+from . import stream
+
+
+def solve_counted(grid, choose=mrv):
+    "Solve grid as solve does; return (values, the search's stats for this grid)."
+    stats = new_stats()
+    return solve(grid, choose, stats), stats
+
+
+def solve_all(grids, name='', choose=mrv, processes=1):
+    """Attempt to solve a sequence of grids with the trail search, on
+    processes worker processes (None for one per core). Report results,
+    and how many values.copy() calls the search did without."""
+    totals = stream.new_totals()
+    stats = new_stats()
+    start = time.perf_counter()
+    for grid, t, (values, puzzle_stats) in batch.solve_stream(functools.partial(solve_counted, choose=choose),
+                                                                grids, processes):
+        stream.add_counts(stats, puzzle_stats)
+        stream.add(totals, t, solved(values), grid)
+    wall = time.perf_counter() - start if processes != 1 else None
+    if totals['N'] > 1:
+        print(stream.summary(totals, name, wall))
+        print(stream.latency(totals))
+        print("  %d values.copy() calls avoided (%d list entries), longest trail %d, "
+              "deepest stack %d." % (stats['copies_avoided'], 81 * stats['copies_avoided'],
+                                     stats['max_trail'], stats['max_depth']))
+
+
+def solved(values):
+    "A puzzle is solved if each unit is a permutation of the digits 1 to 9."
+
+    def unitsolved(unit): return set(values[s] for s in unit) == set(digits)
+
+    return values is not False and all(unitsolved(unit) for unit in unitlist)
+
+
+def from_file(filename, sep='\n'):
+    "Parse a file into a list of strings, separated by sep."
+    return open(filename).read().strip().split(sep)
+
+
+grid1 = '003020600900305001001806400008102900700000008006708200002609500800203009005010300'
+grid2 = '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......'
+
+if __name__ == '__main__':
+    test()
+    solve_all(from_file("top95.txt"), "95sudoku")
+    solve_all(from_file("1000sudoku.txt"), "hard")
+    solve_all(from_file("top95.txt"), "95sudoku (first unfilled)", first_unfilled)
@@ -0,0 +1,209 @@
+## Solve thousands of Sudoku puzzles at once with NumPy
+
+## The batch is an (N, 81) array of candidate masks, as in norvigBitmask.py:
+## bit k of values[n, s] is set when digit k+1 is still possible in square s
+## of puzzle n. norvig.py's two rules are applied to every puzzle at once with
+## whole-array operations:
+##   (1) naked singles: a square with one value takes it from its 20 peers;
+##   (2) hidden singles: a digit with one place in a unit goes there.
+## Puzzles that are still open then branch on their square with the fewest
+## possibilities, one row per candidate, and the new rows are propagated
+## together in the same way. Only what is left after a few rounds of that is
+## handed to norvigBitmask.search one puzzle at a time.
+
+## Throughout this program we have:
+##   values is an (N, 81) array of masks, one row per puzzle (or branch)
+##   owner is an array giving, for each row of values, the puzzle it came from
+##   ok is a boolean array, False for rows that reached a contradiction
+
+import time
+
+import numpy as np
+
+from . import norvigBitmask
+from . import packed
+from .topology import digits, unitlist, peers, unit_indexes
+
+ALL = norvigBitmask.ALL
+PEERS = np.array(peers)  ## (81, 20)
+UNITS = np.array(unitlist)  ## (27, 9)
+## Square s is CELL_POS[s, j] in its j-th unit, unitlist[CELL_UNIT[s, j]].
+CELL_UNIT = np.array(unit_indexes)  ## (81, 3)
+CELL_POS = np.array([[unitlist[i].index(s) for i in unit_indexes[s]] for s in range(81)])
+BITS = (1 << np.arange(9)).astype(np.uint16)  ## Digit index k -> its bit
+POPCOUNT = np.array(norvigBitmask.popcount, dtype=np.uint8)
+
+
+################ Unit Tests ################
+
+def test():
+    "A set of tests that must pass."
+    values, ok = propagate(parse_grids([grid1, '11' + '.' * 79]))
+    assert ok.tolist() == [True, False]
+    assert (POPCOUNT[values[0]] == 1).all()  ## grid1 needs no search
+    grids = from_file("top95.txt")
+    stats = {}
+    results = solve_grids(grids, stats=stats)
+    assert all(norvigBitmask.solved([norvigBitmask.digit_bit[d] for d in values])
+               for values in results)
+    assert sum(stats.values()) == len(grids)
+    assert solve_grids(['11' + '.' * 79]) == [False]
+    corpus = b''.join(packed.pack(grid) for grid in grids)
+    assert (parse_packed(corpus) == parse_grids(grids)).all()
+    print('All tests pass.')
+
+
+################ Parse Grids ################
+
+def parse_grids(grids):
+    "Convert grids into an (N, 81) array: the given digit's bit, or ALL if empty."
+    text = ''.join(''.join(norvigBitmask.grid_chars(grid)) for grid in grids)
+    chars = np.frombuffer(text.encode('ascii'), dtype=np.uint8).reshape(-1, 81)
+    k = chars.astype(np.int16) - ord('1')
+    given = (k >= 0) & (k < 9)
+    return np.where(given, BITS[np.clip(k, 0, 8)], ALL).astype(np.uint16)
+
+
+def parse_packed(corpus):
+    """Convert a packed corpus (see packed.py) into an (N, 81) array like
+    parse_grids, straight from its nibbles, with no text in between."""
+    data = np.frombuffer(corpus, dtype=np.uint8)
+    data = data[:len(data) // packed.SIZE * packed.SIZE].reshape(-1, packed.SIZE)
+    cells = np.stack([data >> 4, data & 15], axis=2).reshape(len(data), -1)[:, :81]
+    k = cells.astype(np.int16) - 1
+    return np.where(k >= 0, BITS[np.clip(k, 0, 8)], ALL).astype(np.uint16)
+
+
+################ Constraint Propagation ################
+
+def propagate(values):
+    """Apply both rules to every row of values until no row changes.
+    Return (values, ok); values is updated in place."""
+    ok = np.ones(len(values), dtype=bool)
+    active = np.arange(len(values))
+    while len(active):
+        v = values[active]
+        ## (1) If a square is reduced to one value, then eliminate it from the peers.
+        single = POPCOUNT[v] == 1
+        placed = np.where(single, v, 0).astype(np.uint16)
+        taken = np.bitwise_or.reduce(placed[:, PEERS], axis=2)
+        bad = (single & (v & taken != 0)).any(axis=1)  ## Two peers hold the same digit
+        v = np.where(single, v, v & ~taken)
+        bad |= (v == 0).any(axis=1)  ## Removed the last value of a square
+        ## (2) If a unit has only one place for a digit, then put it there.
+        u = v[:, UNITS]  ## (n, 27, 9)
+        counts = ((u[..., None] & BITS) != 0).sum(axis=2)  ## (n, 27 units, 9 digits)
+        bad |= (counts == 0).any(axis=(1, 2))  ## No place left for a digit
+        once = ((counts == 1) * BITS).sum(axis=2).astype(np.uint16)
+        h = u & once[..., None]
+        hidden = (h[:, CELL_UNIT[:, 0], CELL_POS[:, 0]] |
+                  h[:, CELL_UNIT[:, 1], CELL_POS[:, 1]] |
+                  h[:, CELL_UNIT[:, 2], CELL_POS[:, 2]])
+        bad |= (POPCOUNT[hidden] > 1).any(axis=1)  ## Two digits need the same square
+        v = np.where(hidden != 0, hidden, v)
+        changed = (v != values[active]).any(axis=1)
+        values[active] = v
+        ok[active[bad]] = False
+        active = active[changed & ~bad]
+    return values, ok
+
+
+def branch(values, owner):
+    """Split every row on its unfilled square with the fewest possibilities
+    (the lowest such square, as norvig.py's min() picks), one row per digit."""
+    counts = POPCOUNT[values].astype(np.int16)
+    counts[counts == 1] = 10
+    s = counts.argmin(axis=1)
+    rows, k = np.nonzero(values[np.arange(len(values)), s][:, None] & BITS)
+    children = values[rows]
+    children[np.arange(len(rows)), s[rows]] = BITS[k]
+    return children, owner[rows]
+
+
+def is_solved(values):
+    "Boolean array: which rows have every square down to one value."
+    return (POPCOUNT[values] == 1).all(axis=1)
+
+
+################ Search ################
+
+def solve_grids(grids, rounds=8, max_rows=1 << 16, stats=None):
+    """Solve a batch of grids (or an (N, 81) array from parse_packed); return a list with, for each grid, a solution
+    as a list of 81 digits, or False. Up to rounds of branching are done on
+    the whole batch while it has at most max_rows rows; the rest is searched
+    one puzzle at a time. stats, if a dict, gets how many puzzles ended at
+    each stage: 'propagation', 'branching', 'search' or 'unsolvable'."""
+    values = grids.copy() if isinstance(grids, np.ndarray) else parse_grids(grids)
+    values, ok = propagate(values)
+    N = len(values)
+    done = ok & is_solved(values)
+    solution = np.where(done[:, None], values, 0).astype(np.uint16)
+    by_propagation = int(done.sum())
+    ## The open puzzles branch together; each row remembers its puzzle.
+    owner = np.nonzero(ok & ~done)[0]
+    rows = values[owner]
+    for _ in range(rounds):
+        if not len(rows) or len(rows) > max_rows:
+            break
+        rows, owner = branch(rows, owner)
+        rows, row_ok = propagate(rows)
+        rows, owner = rows[row_ok], owner[row_ok]
+        finished = is_solved(rows)
+        ## The first solved row of a puzzle is its solution.
+        first, at = np.unique(owner[finished], return_index=True)
+        solution[first] = rows[finished][at]
+        done[first] = True
+        keep = ~finished & ~done[owner]
+        rows, owner = rows[keep], owner[keep]
+    by_branching = int(done.sum()) - by_propagation
+    ## Puzzles with rows still open go to the scalar search, from the state
+    ## propagation left them in; the others either were solved or ran out of rows.
+    open_puzzles = np.unique(owner)
+    results = [[norvigBitmask.bit_digit[m] for m in row] if solved else False
+               for row, solved in zip(solution.tolist(), done.tolist())]
+    for n in open_puzzles.tolist():
+        found = norvigBitmask.search(values[n].tolist())
+        results[n] = found and [norvigBitmask.bit_digit[m] for m in found]
+    if stats is not None:
+        stats['propagation'] = by_propagation
+        stats['branching'] = by_branching
+        stats['search'] = len(open_puzzles)
+        stats['unsolvable'] = N - by_propagation - by_branching - len(open_puzzles)
+    return results
+
+
+################ System test ################
+
+def solve_all(grids, name=''):
+    "Solve a batch of grids at once. Report results, and where each was solved."
+    stats = {}
+    start = time.perf_counter()
+    results = solve_grids(grids, stats=stats)
+    t = time.perf_counter() - start
+    N = len(grids)
+    print("Solved %d of %d %s puzzles (%.2f secs (%d Hz) for the batch)." % (
+        sum(map(solved, results)), N, name, t, N / t))
+    print("  %(propagation)d by propagation, %(branching)d by branching, "
+          "%(search)d by search, %(unsolvable)d unsolvable." % stats)
+
+
+def solved(values):
+    "A puzzle is solved if each unit is a permutation of the digits 1 to 9."
+
+    def unitsolved(unit): return set(values[s] for s in unit) == set(digits)
+
+    return values is not False and all(unitsolved(unit) for unit in unitlist)
+
+
+def from_file(filename, sep='\n'):
+    "Parse a file into a list of strings, separated by sep."
+    return open(filename).read().strip().split(sep)
+
+
+grid1 = '003020600900305001001806400008102900700000008006708200002609500800203009005010300'
+
+if __name__ == '__main__':
+    test()
+    solve_all(from_file("top95.txt"), "95sudoku")
+    solve_all(from_file("100sudoku.txt"), "hard")
+    solve_all(from_file("1000sudoku.txt"), "hard")